@@ -1,12 +1,250 @@
 import tkinter as tk
 from tkinter import messagebox
 from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import argparse
+import cProfile
+import itertools
+import json
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.metrics import METRICS, timed
+
+# Money is held as integer paisa (1 PKR = 100 paisa), so balances stay exact;
+# rupee text is only parsed and formatted at the edges
+# Amounts and balances live in signed 64-bit array columns (histories, batches),
+# so anything outside that range is refused before it reaches the ledger
+MAX_PAISA = 2 ** 63 - 1
+
+def check_paisa(paisa, message="Amount is too large."):
+    if not -MAX_PAISA - 1 <= paisa <= MAX_PAISA:
+        raise ValueError(message)
+    return paisa
+
+def parse_amount(text):
+    try:
+        rupees = Decimal(text.strip().replace(',', ''))
+    except InvalidOperation:
+        raise ValueError("Invalid amount entered.")
+    if not rupees.is_finite():
+        raise ValueError("Invalid amount entered.")
+    paisa = rupees * 100
+    if paisa != paisa.to_integral_value():
+        raise ValueError("Amount can have at most two decimal places.")
+    return check_paisa(int(paisa))
+
+def format_amount(paisa):
+    sign = '-' if paisa < 0 else ''
+    rupees, paisa = divmod(abs(paisa), 100)
+    return f"{sign}{rupees}.{paisa:02d}"
+
+def parse_date(text):
+    try:
+        return date.fromisoformat(text.strip())
+    except ValueError:
+        raise ValueError(f"Invalid date: {text.strip()}")
+
+def day_start(day):
+    return int(datetime(day.year, day.month, day.day).timestamp())
+
+# Kinds of statement entry, stored in AccountHistory.kinds by index
+ENTRY_KINDS = ('Deposit', 'Withdrawal', 'Transfer in', 'Transfer out', 'Interest', 'Fee')
+DEPOSIT, WITHDRAWAL, TRANSFER_IN, TRANSFER_OUT, INTEREST, FEE = range(len(ENTRY_KINDS))
+
+def entry_kind(op, memo=None):
+    if memo == 'interest':
+        return INTEREST
+    if memo == 'fee':
+        return FEE
+    return DEPOSIT if op == 'deposit' else WITHDRAWAL
+
+# One account's postings in the order they were applied, as array columns.
+# Times never go backwards, so a date range is two bisects and a slice.
+class AccountHistory:
+    __slots__ = ('opening', 'times', 'kinds', 'amounts', 'balances')
+
+    def __init__(self, opening=0):
+        # Balance before the first entry
+        self.opening = opening
+        self.times = array('q')
+        self.kinds = array('B')
+        # Signed: credits positive, debits negative
+        self.amounts = array('q')
+        self.balances = array('q')
+
+    def append(self, ts, kind, amount, balance):
+        # Postings are applied in ledger order, but their times are taken
+        # before the ledger lock; a late one is dated with the one before it
+        if self.times and ts < self.times[-1]:
+            ts = self.times[-1]
+        self.times.append(ts)
+        self.kinds.append(kind)
+        self.amounts.append(amount)
+        self.balances.append(balance)
+
+    def rebase(self, balance):
+        # Running balances for entries loaded without them, ending at `balance`
+        self.opening = balance - sum(self.amounts)
+        running = self.opening
+        for i, amount in enumerate(self.amounts):
+            running += amount
+            self.balances[i] = running
+
+    def statement(self, start=None, end=None):
+        # Entries with start <= time < end (epoch seconds; None leaves that
+        # end open) -> (opening balance, closing balance, entries)
+        lo = 0 if start is None else bisect_left(self.times, start)
+        hi = len(self.times) if end is None else bisect_left(self.times, end, lo)
+        opening = self.balances[lo - 1] if lo else self.opening
+        closing = self.balances[hi - 1] if hi else self.opening
+        entries = [(datetime.fromtimestamp(self.times[i]), ENTRY_KINDS[self.kinds[i]], self.amounts[i], self.balances[i])
+                   for i in range(lo, hi)]
+        return opening, closing, entries
+
+# Owner names, case-folded, sorted with their account numbers; one owner can
+# hold several accounts. Exact and prefix lookups are a bisect each.
+class OwnerIndex:
+    def __init__(self):
+        self.keys = []
+
+    def add(self, owner, number):
+        insort(self.keys, (owner.casefold(), number))
+
+    def build(self, accounts):
+        self.keys = sorted((a.owner.casefold(), a.number) for a in accounts)
+
+    def find(self, owner):
+        key = owner.strip().casefold()
+        i = bisect_left(self.keys, (key,))
+        j = bisect_right(self.keys, (key, math.inf), i)
+        return [number for _, number in self.keys[i:j]]
+
+    def search(self, prefix, limit=None):
+        # Account numbers whose owner starts with prefix, in name order
+        key = prefix.strip().casefold()
+        numbers = []
+        for i in range(bisect_left(self.keys, (key,)), len(self.keys)):
+            name, number = self.keys[i]
+            if not name.startswith(key) or (limit is not None and len(numbers) >= limit):
+                break
+            numbers.append(number)
+        return numbers
+
+# Write-ahead, append-only ledger of account events (one JSON record per line)
+class Ledger:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        # Group commit: one writer fsyncs for everyone whose record is written
+        self.lock = threading.Lock()
+        self.synced = threading.Condition(self.lock)
+        self.written_seq = 0
+        self.synced_seq = 0
+        self.syncing = False
+
+    def replay(self, offset=0):
+        # Yields records from the byte offset on; a torn last line left by a
+        # crash is cut off so new records start on a clean line
+        good_offset = offset
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    good_offset += len(line)
+                    yield record
+            if good_offset < os.path.getsize(self.path):
+                with open(self.path, 'r+b') as f:
+                    f.truncate(good_offset)
+
+    def open(self, seq):
+        self.file = open(self.path, 'ab')
+        self.written_seq = self.synced_seq = seq
+
+    def offset(self):
+        return self.file.tell()
+
+    def append(self, record, apply=None):
+        return self.append_many([record], apply)
+
+    @timed('ledger.append')
+    def append_many(self, records, apply=None):
+        # apply() runs under the ledger lock right after the write, so a
+        # snapshot taken under the same lock always matches the ledger offset
+        with self.lock:
+            lines = []
+            for record in records:
+                self.written_seq += 1
+                record['seq'] = self.written_seq
+                lines.append(json.dumps(record) + '\n')
+            seq = self.written_seq
+            data = ''.join(lines).encode('utf-8')
+            self.file.write(data)
+            self.file.flush()
+            METRICS.increment('ledger.bytes', len(data))
+            if apply is not None:
+                apply()
+            # Wait until some fsync covers this record; the first waiter to
+            # find no fsync running does one for every record written so far
+            while self.synced_seq < seq:
+                if self.syncing:
+                    self.synced.wait()
+                    continue
+                self.syncing = True
+                target = self.written_seq
+                self.lock.release()
+                start = time.perf_counter()
+                try:
+                    os.fsync(self.file.fileno())
+                finally:
+                    if METRICS.enabled:
+                        METRICS.record_time('ledger.fsync', time.perf_counter() - start)
+                    self.lock.acquire()
+                    self.syncing = False
+                    self.synced_seq = max(self.synced_seq, target)
+                    self.synced.notify_all()
+        return seq
+
+    def sync(self):
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
 
 # Account classes with abstraction and polymorphism
 class Account(ABC):
-    def __init__(self, owner, balance=0):
+    __slots__ = ('number', 'owner', 'balance', 'ledger', 'lock', 'history')
+
+    def __init__(self, number, owner, balance=0, ledger=None):
+        self.number = number
         self.owner = owner
         self.balance = balance
+        self.ledger = ledger
+        # AccountHistory, or None until the bank loads histories from the ledger
+        self.history = None
+        # Held across each check-and-post, so concurrent callers can't both
+        # pass a balance check; reentrant for transfers
+        self.lock = threading.RLock()
 
     @abstractmethod
     def deposit(self, amount):
@@ -19,41 +257,450 @@ class Account(ABC):
     def get_balance(self):
         return self.balance
 
+    def _post(self, op, amount):
+        if not isinstance(amount, int):
+            raise ValueError("Amount must be a whole number of paisa.")
+        check_paisa(amount)
+        if op == 'deposit':
+            check_paisa(self.balance + amount, "The balance would be too large.")
+        # The call returns once the event is durable in the ledger
+        ts = int(time.time())
+        if self.ledger is not None:
+            self.ledger.append({'op': op, 'account': self.number, 'paisa': amount, 'ts': ts},
+                               lambda: self._apply(op, amount, ts))
+        else:
+            self._apply(op, amount, ts)
+
+    def _apply(self, op, amount, ts=None, kind=None):
+        amount = amount if op == 'deposit' else -amount
+        self.balance += amount
+        if self.history is not None:
+            self.history.append(ts, entry_kind(op) if kind is None else kind, amount, self.balance)
+
 class SavingsAccount(Account):
+    __slots__ = ()
+    overdraft_limit = 0
+    limit_error = "Insufficient funds in Savings Account."
+
     def deposit(self, amount):
         if amount <= 0:
             raise ValueError("Deposit amount must be positive.")
-        self.balance += amount
+        with self.lock:
+            self._post('deposit', amount)
 
-    def withdraw(self, amount):
+    def check_withdraw(self, amount):
         if amount <= 0:
             raise ValueError("Withdrawal amount must be positive.")
         if amount > self.balance:
-            raise ValueError("Insufficient funds in Savings Account.")
-        self.balance -= amount
+            raise ValueError(self.limit_error)
+
+    def withdraw(self, amount):
+        with self.lock:
+            self.check_withdraw(amount)
+            self._post('withdraw', amount)
 
 class CheckingAccount(Account):
+    __slots__ = ()
+    # Allow overdraft up to PKR 500
+    overdraft_limit = 500_00
+    limit_error = "Overdraft limit exceeded in Checking Account."
+
     def deposit(self, amount):
         if amount <= 0:
             raise ValueError("Deposit amount must be positive.")
-        self.balance += amount
+        with self.lock:
+            self._post('deposit', amount)
 
-    def withdraw(self, amount):
+    def check_withdraw(self, amount):
         if amount <= 0:
             raise ValueError("Withdrawal amount must be positive.")
-        # Allow overdraft up to PKR 500
-        if amount > self.balance + 500:
-            raise ValueError("Overdraft limit exceeded in Checking Account.")
-        self.balance -= amount
+        if amount > self.balance + self.overdraft_limit:
+            raise ValueError(self.limit_error)
+
+    def withdraw(self, amount):
+        with self.lock:
+            self.check_withdraw(amount)
+            self._post('withdraw', amount)
+
+ACCOUNT_TYPES = {'Savings': SavingsAccount, 'Checking': CheckingAccount}
+
+def account_class(acc_type):
+    if acc_type not in ACCOUNT_TYPES:
+        raise ValueError(f"Unknown account type: {acc_type}")
+    return ACCOUNT_TYPES[acc_type]
+FIRST_ACCOUNT_NUMBER = 100001
+
+def account_type(account):
+    return 'Savings' if isinstance(account, SavingsAccount) else 'Checking'
+
+# Accounts, keyed by account number, recovered from the latest balance
+# snapshot plus the ledger tail
+class Bank:
+    def __init__(self, ledger_file='bank_ledger.jsonl', snapshot_file='bank_snapshot.json', snapshot_every=1000):
+        # ledger_file=None keeps everything in memory
+        self.ledger = Ledger(ledger_file) if ledger_file is not None else None
+        self.snapshot_file = snapshot_file
+        self.snapshot_every = snapshot_every
+        self.snapshot_lock = threading.Lock()
+        self.open_lock = threading.Lock()
+        self.accounts = {}
+        self.owners = OwnerIndex()
+        self.next_number = FIRST_ACCOUNT_NUMBER
+        # In memory every account keeps its history from the start; with a
+        # ledger the histories are read from it when first asked for
+        self.histories_loaded = self.ledger is None
+        if self.ledger is not None:
+            self.recover()
+
+    def recover(self):
+        seq, offset = 0, 0
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'r') as f:
+                snapshot = json.load(f)
+            seq, offset = snapshot['seq'], snapshot['ledger_offset']
+            self.next_number = snapshot['next_number']
+            for a in snapshot['accounts']:
+                self._restore(a['number'], a['owner'], a['type'], a['balance_paisa'])
+        self.snapshot_seq = seq
+        # Replay only what happened after the snapshot
+        for record in self.ledger.replay(offset):
+            if record['op'] == 'open':
+                self._restore(record['account'], record['owner'], record['type'], 0)
+            else:
+                source = self.accounts[record['account']]
+                if record['op'] == 'transfer':
+                    source._apply('withdraw', record['paisa'])
+                    self.accounts[record['to']]._apply('deposit', record['paisa'])
+                else:
+                    source._apply(record['op'], record['paisa'])
+            seq = record['seq']
+        self.owners.build(self.accounts.values())
+        self.ledger.open(seq)
+
+    def _restore(self, number, owner, acc_type, balance):
+        self.next_number = max(self.next_number, number + 1)
+        self.accounts[number] = ACCOUNT_TYPES[acc_type](number, owner, balance, self.ledger)
+
+    @timed('bank.open_account')
+    def open_account(self, owner, acc_type):
+        with self.open_lock:
+            number = self.next_number
+            account = account_class(acc_type)(number, owner, 0, self.ledger)
+
+            def apply():
+                if self.histories_loaded:
+                    account.history = AccountHistory()
+                self.accounts[number] = account
+                self.owners.add(owner, number)
+                self.next_number = number + 1
+            if self.ledger is not None:
+                self.ledger.append({'op': 'open', 'account': number, 'owner': owner, 'type': acc_type,
+                                    'ts': int(time.time())}, apply)
+            else:
+                apply()
+        self.record_event()
+        return account
+
+    def find_accounts(self, text, limit=None):
+        # An account number, or otherwise the accounts of every owner whose
+        # name starts with the text (case-insensitive)
+        text = text.strip()
+        if text.isdecimal() and int(text) in self.accounts:
+            return [self.accounts[int(text)]]
+        return [self.accounts[number] for number in self.owners.search(text, limit)] if text else []
+
+    @timed('bank.deposit')
+    def deposit(self, number, amount):
+        self.accounts[number].deposit(amount)
+        self.record_event()
+
+    @timed('bank.withdraw')
+    def withdraw(self, number, amount):
+        self.accounts[number].withdraw(amount)
+        self.record_event()
+
+    @timed('bank.transfer')
+    def transfer(self, from_number, to_number, amount):
+        if from_number == to_number:
+            raise ValueError("Cannot transfer to the same account.")
+        source, target = self.accounts[from_number], self.accounts[to_number]
+        if not isinstance(amount, int):
+            raise ValueError("Amount must be a whole number of paisa.")
+        if amount <= 0:
+            raise ValueError("Transfer amount must be positive.")
+        check_paisa(amount)
+        # Always lock in account-number order, so two opposite transfers can't deadlock
+        first, second = sorted((source, target), key=lambda a: a.number)
+        with first.lock, second.lock:
+            source.check_withdraw(amount)
+            check_paisa(target.balance + amount, "The balance would be too large.")
+            ts = int(time.time())
+
+            def apply():
+                source._apply('withdraw', amount, ts, TRANSFER_OUT)
+                target._apply('deposit', amount, ts, TRANSFER_IN)
+            # One ledger record, so recovery never sees half a transfer
+            if self.ledger is not None:
+                self.ledger.append({'op': 'transfer', 'account': from_number, 'to': to_number, 'paisa': amount, 'ts': ts},
+                                   apply)
+            else:
+                apply()
+        self.record_event()
+
+    def load_histories(self):
+        # Reads every dated posting in the ledger into per-account histories.
+        # Held under the ledger lock, so no posting is both read here and
+        # appended by its apply(); from then on each posting appends itself.
+        with self.ledger.lock:
+            if self.histories_loaded:
+                return
+            histories = {number: AccountHistory() for number in self.accounts}
+            for record in self.ledger.replay(0):
+                if record['op'] == 'open':
+                    continue
+                paisa, ts = record['paisa'], record['ts']
+                if record['op'] == 'transfer':
+                    histories[record['account']].append(ts, TRANSFER_OUT, -paisa, 0)
+                    histories[record['to']].append(ts, TRANSFER_IN, paisa, 0)
+                else:
+                    kind = entry_kind(record['op'], record.get('memo'))
+                    histories[record['account']].append(ts, kind, paisa if record['op'] == 'deposit' else -paisa, 0)
+            for number, history in histories.items():
+                account = self.accounts[number]
+                history.rebase(account.balance)
+                account.history = history
+            self.histories_loaded = True
+
+    @timed('bank.statement')
+    def statement(self, number, start=None, end=None):
+        # Postings dated start..end (dates, both inclusive; None leaves that
+        # end open) -> (opening balance, closing balance, entries), each entry
+        # being (datetime, kind, signed amount, balance after)
+        account = self.accounts[number]
+        if not self.histories_loaded:
+            self.load_histories()
+        if start is not None and end is not None and end < start:
+            raise ValueError("The statement end date is before its start date.")
+        start = None if start is None else day_start(start)
+        end = None if end is None else day_start(end + timedelta(days=1))
+        with account.lock:
+            return account.history.statement(start, end)
+
+    def record_event(self):
+        if self.ledger is None:
+            return
+        # One thread snapshots at a time; the others just carry on
+        if self.ledger.written_seq - self.snapshot_seq >= self.snapshot_every and self.snapshot_lock.acquire(blocking=False):
+            try:
+                self.save_snapshot()
+            finally:
+                self.snapshot_lock.release()
+
+    @timed('bank.save_snapshot')
+    def save_snapshot(self):
+        # Balances as of the ledger's current end; written atomically
+        with self.ledger.lock:
+            snapshot = {
+                'seq': self.ledger.written_seq,
+                'ledger_offset': self.ledger.offset(),
+                'next_number': self.next_number,
+                'accounts': [{'number': a.number, 'owner': a.owner, 'type': account_type(a), 'balance_paisa': a.balance}
+                             for a in self.accounts.values()]
+            }
+        # Never let the snapshot get ahead of what the ledger has on disk
+        self.ledger.sync()
+        tmp_path = self.snapshot_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_file)
+        self.snapshot_seq = snapshot['seq']
+        if METRICS.enabled:
+            METRICS.record_size('snapshot.bytes', os.path.getsize(self.snapshot_file))
+
+    def close(self):
+        if self.ledger is not None:
+            self.ledger.close()
+
+# Runs bank operations on a thread pool; per-account locks keep them safe
+class TransactionEngine:
+    OPERATIONS = ('deposit', 'withdraw', 'transfer')
+
+    def __init__(self, bank, workers=4):
+        self.bank = bank
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def submit(self, op, *args):
+        if op not in self.OPERATIONS:
+            raise ValueError(f"Unknown operation: {op}")
+        return self.pool.submit(getattr(self.bank, op), *args)
+
+    def run(self, operations):
+        # operations: iterable of (op, *args); returns (ok, error) per operation
+        futures = [self.submit(op, *args) for op, *args in operations]
+        results = []
+        for future in futures:
+            try:
+                future.result()
+                results.append((True, None))
+            except ValueError as e:
+                results.append((False, str(e)))
+            except KeyError as e:
+                results.append((False, f"Account not found: {e.args[0]}"))
+        return results
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+# End-of-day processing over array columns of balances and limits, keyed by
+# account index; the ledger is written and fsynced once per chunk
+class BatchProcessor:
+    def __init__(self, bank, chunk_size=100000):
+        self.bank = bank
+        self.chunk_size = chunk_size
+
+    @contextmanager
+    def _columns(self):
+        # Holds every account lock (in number order, like transfers) for the run
+        with ExitStack() as stack:
+            self.accounts = sorted(self.bank.accounts.values(), key=lambda a: a.number)
+            for account in self.accounts:
+                stack.enter_context(account.lock)
+            self.index = {a.number: i for i, a in enumerate(self.accounts)}
+            self.balances = array('q', [a.balance for a in self.accounts])
+            self.limits = array('q', [a.overdraft_limit for a in self.accounts])
+            self.kinds = [type(a) for a in self.accounts]
+            try:
+                yield
+            finally:
+                self.accounts = self.index = self.balances = self.limits = self.kinds = None
+        self.bank.record_event()
+
+    def _commit(self, records, touched):
+        def apply():
+            if self.bank.histories_loaded:
+                self._append_histories(records)
+            for i in touched:
+                self.accounts[i].balance = self.balances[i]
+        if not records:
+            return
+        if self.bank.ledger is not None:
+            self.bank.ledger.append_many(records, apply)
+        else:
+            apply()
+
+    def _append_histories(self, records):
+        # Runs before the balances are set, so each entry can carry the
+        # balance after it
+        running = {}
+        for record in records:
+            account = self.bank.accounts[record['account']]
+            amount = record['paisa'] if record['op'] == 'deposit' else -record['paisa']
+            balance = running[account.number] = running.get(account.number, account.balance) + amount
+            account.history.append(record['ts'], entry_kind(record['op'], record.get('memo')), amount, balance)
+
+    @timed('batch.post')
+    def post(self, records):
+        # records: iterable of (op, account number, amount), op being 'deposit' or
+        # 'withdraw'; returns (row, reason) for every rejected record, the
+        # first record being row 1
+        rejected = []
+        records = iter(records)
+        row = 1
+        with self._columns():
+            balances, limits, index = self.balances, self.limits, self.index
+            while True:
+                chunk = list(itertools.islice(records, self.chunk_size))
+                if not chunk:
+                    break
+                accepted, touched = [], set()
+                ts = int(time.time())
+                for op, number, amount in chunk:
+                    i = index.get(number)
+                    if i is None:
+                        rejected.append((row, f"Account not found: {number}"))
+                    elif op not in ('deposit', 'withdraw'):
+                        rejected.append((row, f"Unknown operation: {op}"))
+                    elif not isinstance(amount, int):
+                        rejected.append((row, "Amount must be a whole number of paisa."))
+                    elif amount <= 0:
+                        rejected.append((row, "Deposit amount must be positive." if op == 'deposit'
+                                         else "Withdrawal amount must be positive."))
+                    elif amount > MAX_PAISA:
+                        rejected.append((row, "Amount is too large."))
+                    elif op == 'deposit' and balances[i] + amount > MAX_PAISA:
+                        rejected.append((row, "The balance would be too large."))
+                    elif op == 'withdraw' and amount > balances[i] + limits[i]:
+                        rejected.append((row, self.accounts[i].limit_error))
+                    else:
+                        balances[i] += amount if op == 'deposit' else -amount
+                        accepted.append({'op': op, 'account': number, 'paisa': amount, 'ts': ts})
+                        touched.add(i)
+                    row += 1
+                self._commit(accepted, touched)
+        return rejected
+
+    @timed('batch.accrue_interest')
+    def accrue_interest(self, rate, acc_type='Savings'):
+        # Credits balance * rate to every account of the type with a positive
+        # balance; returns the number of accounts credited. The rate is taken
+        # as a Decimal (0.01 or '0.01' for 1%) so the credit is exact
+        try:
+            rate = Decimal(str(rate))
+        except InvalidOperation:
+            raise ValueError("Invalid interest rate.")
+        if not rate.is_finite() or rate < 0:
+            raise ValueError("Invalid interest rate.")
+        kind = account_class(acc_type)
+        with self._columns():
+            balances = self.balances
+            eligible = [i for i, k in enumerate(self.kinds) if k is kind and balances[i] > 0]
+            # Rounded to the nearest paisa, halves up
+            credits = [(i, int((balances[i] * rate).to_integral_value(ROUND_HALF_UP))) for i in eligible]
+            credits = [(i, credit) for i, credit in credits if credit > 0]
+            for i, credit in credits:
+                check_paisa(balances[i] + credit, f"Interest would make the balance of account {self.accounts[i].number} too large.")
+            for i, credit in credits:
+                balances[i] += credit
+            ts = int(time.time())
+            self._commit([{'op': 'deposit', 'account': self.accounts[i].number, 'paisa': credit, 'memo': 'interest', 'ts': ts}
+                          for i, credit in credits], [i for i, _ in credits])
+        return len(credits)
+
+    @timed('batch.assess_fee')
+    def assess_fee(self, fee, acc_type='Checking', below=None):
+        # Charges the fee to every account of the type (only those under
+        # `below` if given); returns (number, reason) for accounts that can't pay
+        if not isinstance(fee, int) or not 0 < fee <= MAX_PAISA:
+            raise ValueError("Fee must be a positive number of paisa.")
+        kind = account_class(acc_type)
+        with self._columns():
+            balances, limits = self.balances, self.limits
+            charged = [i for i, k in enumerate(self.kinds) if k is kind and (below is None or balances[i] < below)]
+            rejected = [(self.accounts[i].number, self.accounts[i].limit_error) for i in charged if fee > balances[i] + limits[i]]
+            touched = [i for i in charged if fee <= balances[i] + limits[i]]
+            for i in touched:
+                balances[i] -= fee
+            ts = int(time.time())
+            self._commit([{'op': 'withdraw', 'account': self.accounts[i].number, 'paisa': fee, 'memo': 'fee', 'ts': ts}
+                          for i in touched], touched)
+        return rejected
 
 # Main GUI Application
 class BankApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Bank Account Management System")
-        self.accounts = {}
+        self.bank = Bank()
+        self.accounts = self.bank.accounts
 
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        self.bank.close()
+        self.root.destroy()
 
     def create_widgets(self):
         frame_create = tk.LabelFrame(self.root, text="Create Account", padx=10, pady=10)
@@ -73,9 +720,10 @@ class BankApp:
         frame_transact = tk.LabelFrame(self.root, text="Transactions", padx=10, pady=10)
         frame_transact.grid(row=1, column=0, padx=10, pady=10, sticky="ew")
 
-        tk.Label(frame_transact, text="Owner Name:").grid(row=0, column=0, sticky="w")
-        self.trans_owner_entry = tk.Entry(frame_transact)
-        self.trans_owner_entry.grid(row=0, column=1)
+        tk.Label(frame_transact, text="Account No. or Owner:").grid(row=0, column=0, sticky="w")
+        self.account_entry = tk.Entry(frame_transact)
+        self.account_entry.grid(row=0, column=1)
+        tk.Button(frame_transact, text="Find", command=self.find_accounts).grid(row=0, column=2, padx=5)
 
         tk.Label(frame_transact, text="Amount:").grid(row=1, column=0, sticky="w")
         self.amount_entry = tk.Entry(frame_transact)
@@ -85,63 +733,149 @@ class BankApp:
         tk.Button(frame_transact, text="Withdraw", command=self.withdraw).grid(row=2, column=1, pady=5)
         tk.Button(frame_transact, text="Check Balance", command=self.check_balance).grid(row=3, column=0, columnspan=2, pady=5)
 
+        frame_statement = tk.LabelFrame(self.root, text="Statement", padx=10, pady=10)
+        frame_statement.grid(row=2, column=0, padx=10, pady=10, sticky="ew")
+
+        tk.Label(frame_statement, text="From (YYYY-MM-DD):").grid(row=0, column=0, sticky="w")
+        self.from_entry = tk.Entry(frame_statement)
+        self.from_entry.grid(row=0, column=1)
+
+        tk.Label(frame_statement, text="To (YYYY-MM-DD):").grid(row=1, column=0, sticky="w")
+        self.to_entry = tk.Entry(frame_statement)
+        self.to_entry.grid(row=1, column=1)
+
+        tk.Button(frame_statement, text="Show Statement", command=self.show_statement).grid(row=2, column=0, columnspan=2, pady=5)
+
+        tk.Button(self.root, text="Diagnostics", command=self.show_diagnostics).grid(row=3, column=0, pady=(0, 10))
+
     def create_account(self):
         owner = self.owner_entry.get().strip()
         if not owner:
             messagebox.showerror("Error", "Owner name cannot be empty.")
             return
-        if owner in self.accounts:
-            messagebox.showerror("Error", "Account already exists for this owner.")
-            return
         acc_type = self.account_type_var.get()
-        if acc_type == "Savings":
-            self.accounts[owner] = SavingsAccount(owner)
-        else:
-            self.accounts[owner] = CheckingAccount(owner)
-        messagebox.showinfo("Success", f"{acc_type} Account created for {owner}.")
+        try:
+            account = self.bank.open_account(owner, acc_type)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        messagebox.showinfo("Success", f"{acc_type} Account {account.number} created for {owner}.")
         self.owner_entry.delete(0, tk.END)
 
-    def deposit(self):
-        owner = self.trans_owner_entry.get().strip()
-        if owner not in self.accounts:
+    def selected_account(self):
+        # An account number, or an owner name (any case) with just one account
+        text = self.account_entry.get().strip()
+        if text.isdecimal() and int(text) in self.accounts:
+            return self.accounts[int(text)]
+        numbers = self.bank.owners.find(text) if text else []
+        if len(numbers) == 1:
+            return self.accounts[numbers[0]]
+        if numbers:
+            messagebox.showerror("Error", f"{text} holds {len(numbers)} accounts; enter the account number.")
+        else:
             messagebox.showerror("Error", "Account not found.")
+        return None
+
+    def find_accounts(self):
+        accounts = self.bank.find_accounts(self.account_entry.get(), limit=50)
+        if not accounts:
+            messagebox.showinfo("Find", "No matching accounts.")
+            return
+        messagebox.showinfo("Find", '\n'.join(f"{a.number}  {a.owner}  {account_type(a)}  PKR {format_amount(a.balance)}"
+                                              for a in accounts))
+
+    def deposit(self):
+        account = self.selected_account()
+        if account is None:
             return
         try:
-            amount = float(self.amount_entry.get())
-        except ValueError:
-            messagebox.showerror("Error", "Invalid amount entered.")
+            amount = parse_amount(self.amount_entry.get())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
             return
         try:
-            self.accounts[owner].deposit(amount)
-            messagebox.showinfo("Success", f"Deposited PKR {amount:.2f} to {owner}'s account.")
+            self.bank.deposit(account.number, amount)
+            messagebox.showinfo("Success", f"Deposited PKR {format_amount(amount)} to account {account.number} ({account.owner}).")
         except ValueError as e:
             messagebox.showerror("Error", str(e))
 
     def withdraw(self):
-        owner = self.trans_owner_entry.get().strip()
-        if owner not in self.accounts:
-            messagebox.showerror("Error", "Account not found.")
+        account = self.selected_account()
+        if account is None:
             return
         try:
-            amount = float(self.amount_entry.get())
-        except ValueError:
-            messagebox.showerror("Error", "Invalid amount entered.")
+            amount = parse_amount(self.amount_entry.get())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
             return
         try:
-            self.accounts[owner].withdraw(amount)
-            messagebox.showinfo("Success", f"Withdrew PKR {amount:.2f} from {owner}'s account.")
+            self.bank.withdraw(account.number, amount)
+            messagebox.showinfo("Success", f"Withdrew PKR {format_amount(amount)} from account {account.number} ({account.owner}).")
         except ValueError as e:
             messagebox.showerror("Error", str(e))
 
     def check_balance(self):
-        owner = self.trans_owner_entry.get().strip()
-        if owner not in self.accounts:
-            messagebox.showerror("Error", "Account not found.")
+        account = self.selected_account()
+        if account is None:
+            return
+        messagebox.showinfo("Balance", f"Balance for account {account.number} ({account.owner}): PKR {format_amount(account.get_balance())}")
+
+    def show_statement(self):
+        account = self.selected_account()
+        if account is None:
             return
-        balance = self.accounts[owner].get_balance()
-        messagebox.showinfo("Balance", f"Balance for {owner}'s account: PKR {balance:.2f}")
+        try:
+            start, end = (parse_date(e.get()) if e.get().strip() else None for e in (self.from_entry, self.to_entry))
+            opening, closing, entries = self.bank.statement(account.number, start, end)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        lines = [f"Account {account.number}, {account.owner} ({account_type(account)})",
+                 f"{start or 'Opening'} to {end or 'today'}", "",
+                 f"{'Date':19}  {'Entry':12} {'Amount':>14} {'Balance':>14}",
+                 f"{'':19}  {'Opening balance':27} {format_amount(opening):>14}"]
+        lines += [f"{when:%Y-%m-%d %H:%M:%S}  {kind:12} {format_amount(amount):>14} {format_amount(balance):>14}"
+                  for when, kind, amount, balance in entries]
+        lines.append(f"{'':19}  {'Closing balance':27} {format_amount(closing):>14}")
+        window = tk.Toplevel(self.root)
+        window.title(f"Statement for account {account.number}")
+        text = tk.Text(window, width=72, height=24, font=('Courier', 10))
+        text.insert(tk.END, '\n'.join(lines))
+        text.config(state='disabled')
+        text.pack(fill='both', expand=True, padx=10, pady=10)
+
+    def show_diagnostics(self):
+        if not METRICS.enabled:
+            messagebox.showinfo("Diagnostics", "Start the app with --profile to collect timings.")
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Diagnostics")
+        text = tk.Text(window, width=92, height=20, font=('Courier', 10))
+        text.insert(tk.END, METRICS.report())
+        text.config(state='disabled')
+        text.pack(fill='both', expand=True, padx=10, pady=10)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bank Account Management System")
+    parser.add_argument('--profile', action='store_true',
+                        help="collect timings and run under cProfile and tracemalloc; reports are printed on exit")
+    args = parser.parse_args()
+
+    if args.profile:
+        METRICS.enabled = True
+        tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
     root = tk.Tk()
     app = BankApp(root)
     root.mainloop()
+    if args.profile:
+        profiler.disable()
+        profiler.dump_stats('bank.prof')
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"Memory: {current / 1e6:.1f} MB in use, {peak / 1e6:.1f} MB peak")
+        for stat in tracemalloc.take_snapshot().statistics('lineno')[:10]:
+            print(stat)
+        print(METRICS.report())
+        print("Full profile saved to bank.prof")
@@ -1,12 +1,38 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from abc import ABC, abstractmethod
-from datetime import datetime
+from array import array
+from collections.abc import Mapping, Sequence
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import argparse
+import bisect
+import cProfile
+import csv
+import gzip
+import hashlib
+import heapq
+import itertools
 import json
 import os
+import pstats
+import queue
+import re
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.metrics import METRICS, timed
 
 # Base classes
 class LibraryItem(ABC):
+    __slots__ = ('item_id', 'title')
+
     def __init__(self, item_id, title):
         self.item_id = item_id
         self.title = title
@@ -16,6 +42,8 @@ class LibraryItem(ABC):
         pass
 
 class Book(LibraryItem):
+    __slots__ = ('author', 'total_copies', 'available_copies')
+
     def __init__(self, item_id, title, author, total_copies):
         super().__init__(item_id, title)
         self.author = author
@@ -26,6 +54,8 @@ class Book(LibraryItem):
         return f"{self.item_id} | {self.title} | {self.author} | {self.available_copies}/{self.total_copies}"
 
 class Member:
+    __slots__ = ('member_id', 'name')
+
     def __init__(self, member_id, name):
         self.member_id = member_id
         self.name = name
@@ -34,6 +64,8 @@ class Member:
         return f"{self.member_id} | {self.name}"
 
 class Transaction(ABC):
+    __slots__ = ('transaction_id', 'member_id', 'book_id', 'date')
+
     def __init__(self, transaction_id, member_id, book_id, date):
         self.transaction_id = transaction_id
         self.member_id = member_id
@@ -45,139 +77,2398 @@ class Transaction(ABC):
         pass
 
 class BorrowTransaction(Transaction):
+    __slots__ = ('due_date',)
+
+    def __init__(self, transaction_id, member_id, book_id, date, due_date=None):
+        super().__init__(transaction_id, member_id, book_id, date)
+        # Borrows recorded before due dates existed get the default loan period
+        self.due_date = due_date or due_after(date)
+
     def display(self):
-        return f"{self.transaction_id} | Borrow | {self.member_id} | {self.book_id} | {self.date}"
+        return f"{self.transaction_id} | Borrow | {self.member_id} | {self.book_id} | {self.date} | Due {self.due_date}"
 
 class ReturnTransaction(Transaction):
+    __slots__ = ('fine',)
+
+    def __init__(self, transaction_id, member_id, book_id, date, fine=0):
+        super().__init__(transaction_id, member_id, book_id, date)
+        # Charged when the book came back overdue
+        self.fine = fine
+
     def display(self):
-        return f"{self.transaction_id} | Return | {self.member_id} | {self.book_id} | {self.date}"
+        text = f"{self.transaction_id} | Return | {self.member_id} | {self.book_id} | {self.date}"
+        return f"{text} | Fine {self.fine}" if self.fine else text
+
+# Dates are stored as whole seconds since 1970-01-01 of the naive local
+# timestamp, so the round trip to the display string is exact in any timezone
+EPOCH = datetime(1970, 1, 1)
+
+def date_to_timestamp(date):
+    return int((datetime.fromisoformat(date) - EPOCH).total_seconds())
+
+def timestamp_to_date(timestamp):
+    return (EPOCH + timedelta(seconds=timestamp)).isoformat(' ')
+
+SECONDS_PER_DAY = 86400
+
+# Default loan period, and the fine for each started day a loan is overdue
+LOAN_DAYS = 14
+FINE_PER_DAY = 10
+
+def due_after(date, days=LOAN_DAYS):
+    return timestamp_to_date(date_to_timestamp(date) + days * SECONDS_PER_DAY)
+
+def overdue_fine(due, now):
+    # due and now as timestamps
+    days = -((due - now) // SECONDS_PER_DAY)
+    return days * FINE_PER_DAY if days > 0 else 0
+
+# Interns repeated IDs as small integer codes
+class StringTable:
+    __slots__ = ('codes', 'strings')
+
+    def __init__(self):
+        self.codes = {}
+        self.strings = []
+
+    def code(self, string):
+        code = self.codes.get(string)
+        if code is None:
+            code = self.codes[string] = len(self.strings)
+            self.strings.append(string)
+        return code
+
+# Column-oriented transaction history; rows become Transaction objects only when read
+class TransactionStore(Sequence):
+    RETURN_FLAG = 1
+
+    def __init__(self):
+        self.transaction_ids = []
+        self.member_codes = array('I')
+        self.book_codes = array('I')
+        self.timestamps = array('q')
+        self.flags = array('B')
+        # Due timestamp of each borrow; 0 for returns
+        self.due_timestamps = array('q')
+        # Fine charged on each return; 0 for borrows
+        self.fines = array('q')
+        self.member_table = StringTable()
+        self.book_table = StringTable()
+
+    def append(self, t_type, transaction_id, member_id, book_id, date, due_date=None, fine=0):
+        timestamp = date_to_timestamp(date)
+        self.transaction_ids.append(transaction_id)
+        self.member_codes.append(self.member_table.code(member_id))
+        self.book_codes.append(self.book_table.code(book_id))
+        self.timestamps.append(timestamp)
+        if t_type == 'return':
+            self.flags.append(self.RETURN_FLAG)
+            self.due_timestamps.append(0)
+            self.fines.append(fine)
+        else:
+            self.flags.append(0)
+            self.due_timestamps.append(date_to_timestamp(due_date) if due_date else timestamp + LOAN_DAYS * SECONDS_PER_DAY)
+            self.fines.append(0)
+
+    def pop(self):
+        # Drops the newest row; its interned IDs stay in the string tables
+        for column in (self.transaction_ids, self.member_codes, self.book_codes, self.timestamps, self.flags, self.due_timestamps,
+                       self.fines):
+            column.pop()
+
+    def __len__(self):
+        return len(self.transaction_ids)
+
+    def _row(self, i):
+        if self.flags[i] & self.RETURN_FLAG:
+            return ReturnTransaction(self.transaction_ids[i], self.member_table.strings[self.member_codes[i]],
+                                     self.book_table.strings[self.book_codes[i]], timestamp_to_date(self.timestamps[i]),
+                                     self.fines[i])
+        return BorrowTransaction(self.transaction_ids[i], self.member_table.strings[self.member_codes[i]],
+                                 self.book_table.strings[self.book_codes[i]], timestamp_to_date(self.timestamps[i]),
+                                 timestamp_to_date(self.due_timestamps[i]))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("transaction index out of range")
+        return self._row(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def loan_events(self):
+        # (type, transaction_id, member_id, book_id, due timestamp, fine) without building objects
+        members, books = self.member_table.strings, self.book_table.strings
+        for transaction_id, member_code, book_code, flag, due, fine in zip(self.transaction_ids, self.member_codes,
+                                                                            self.book_codes, self.flags, self.due_timestamps,
+                                                                            self.fines):
+            yield ('return' if flag & self.RETURN_FLAG else 'borrow', transaction_id, members[member_code], books[book_code],
+                   due, fine)
+
+    def circulation_events(self):
+        # (type, member_id, book_id, day number since EPOCH) straight from the columns
+        members, books = self.member_table.strings, self.book_table.strings
+        for member_code, book_code, timestamp, flag in zip(self.member_codes, self.book_codes, self.timestamps, self.flags):
+            yield ('return' if flag & self.RETURN_FLAG else 'borrow', members[member_code], books[book_code],
+                   timestamp // SECONDS_PER_DAY)
+
+    def record(self, i):
+        record = {
+            'transaction_id': self.transaction_ids[i],
+            'member_id': self.member_table.strings[self.member_codes[i]],
+            'book_id': self.book_table.strings[self.book_codes[i]],
+            'date': timestamp_to_date(self.timestamps[i]),
+            'type': 'return' if self.flags[i] & self.RETURN_FLAG else 'borrow'
+        }
+        if record['type'] == 'borrow':
+            record['due_date'] = timestamp_to_date(self.due_timestamps[i])
+        else:
+            record['fine'] = self.fines[i]
+        return record
+
+    def records(self):
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def subset(self, indexes):
+        # A new store with only the given rows, re-interning their IDs
+        store = TransactionStore()
+        members, books = self.member_table.strings, self.book_table.strings
+        for i in indexes:
+            store.transaction_ids.append(self.transaction_ids[i])
+            store.member_codes.append(store.member_table.code(members[self.member_codes[i]]))
+            store.book_codes.append(store.book_table.code(books[self.book_codes[i]]))
+            store.timestamps.append(self.timestamps[i])
+            store.flags.append(self.flags[i])
+            store.due_timestamps.append(self.due_timestamps[i])
+            store.fines.append(self.fines[i])
+        return store
+
+    def select(self, column, table, value):
+        code = table.codes.get(value)
+        if code is None:
+            return []
+        return [self._row(i) for i, c in enumerate(column) if c == code]
+
+    def select_member(self, member_id):
+        return self.select(self.member_codes, self.member_table, member_id)
+
+    def select_book(self, book_id):
+        return self.select(self.book_codes, self.book_table, book_id)
+
+    def select_between(self, start_date, end_date):
+        start, end = date_to_timestamp(start_date), date_to_timestamp(end_date)
+        return [self._row(i) for i, ts in enumerate(self.timestamps) if start <= ts <= end]
+
+    # Binary snapshot: header, then length-prefixed sections padded to 8 bytes.
+    # String sections are NUL-joined UTF-8; columns are raw arrays in native
+    # byte order, so the file can be mmapped or bulk-read without parsing.
+    MAGIC = b'LIBTXN01'
+    HEADER = struct.Struct('<8sqQ')
+    SECTION = struct.Struct('<Q')
+
+    def _sections(self):
+        yield '\0'.join(self.transaction_ids).encode('utf-8')
+        yield '\0'.join(self.member_table.strings).encode('utf-8')
+        yield '\0'.join(self.book_table.strings).encode('utf-8')
+        yield self.member_codes.tobytes()
+        yield self.book_codes.tobytes()
+        yield self.timestamps.tobytes()
+        yield self.flags.tobytes()
+        yield self.due_timestamps.tobytes()
+        yield self.fines.tobytes()
+
+    def write_binary(self, path, seq):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, seq, len(self)))
+            for data in self._sections():
+                f.write(self.SECTION.pack(len(data)))
+                f.write(data)
+                f.write(b'\0' * (-len(data) % 8))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def read_binary_seq(cls, path):
+        with open(path, 'rb') as f:
+            magic, seq, _ = cls.HEADER.unpack(f.read(cls.HEADER.size))
+        if magic != cls.MAGIC:
+            raise ValueError(f"{path} is not a transaction snapshot.")
+        return seq
+
+    @classmethod
+    def read_binary(cls, path):
+        store = cls()
+        with open(path, 'rb') as f:
+            magic, seq, count = cls.HEADER.unpack(f.read(cls.HEADER.size))
+            if magic != cls.MAGIC:
+                raise ValueError(f"{path} is not a transaction snapshot.")
+
+            def section():
+                size = cls.SECTION.unpack(f.read(cls.SECTION.size))[0]
+                data = f.read(size)
+                f.seek(-size % 8, os.SEEK_CUR)
+                return data
+
+            def strings():
+                data = section().decode('utf-8')
+                return data.split('\0') if data else []
+
+            store.transaction_ids = strings()
+            for table in (store.member_table, store.book_table):
+                table.strings = strings()
+                table.codes = {string: code for code, string in enumerate(table.strings)}
+            for column in (store.member_codes, store.book_codes, store.timestamps, store.flags, store.due_timestamps,
+                           store.fines):
+                column.frombytes(section())
+        if any(len(column) != count for column in (store.transaction_ids, store.member_codes, store.timestamps, store.flags,
+                                                   store.due_timestamps, store.fines)):
+            raise ValueError(f"{path} is truncated or corrupt.")
+        return seq, store
+
+def stream_json_snapshot(path, chunk_size=1 << 16):
+    # Returns (seq, records) where records decodes one record at a time, so
+    # the file is never held in memory as a whole
+    f = open(path, 'r')
+    decoder = json.JSONDecoder()
+    separators = re.compile(r'[\s,]*')
+    buf = f.read(chunk_size)
+    match = re.match(r'\s*\{\s*"seq"\s*:\s*(\d+)\s*,\s*"records"\s*:\s*\[', buf)
+    if match:
+        seq = int(match.group(1))
+    else:
+        # Plain lists are snapshots written before the journal existed
+        match = re.match(r'\s*\[', buf)
+        if match is None:
+            f.close()
+            raise ValueError(f"{path} is not a snapshot file.")
+        seq = 0
+
+    def records():
+        nonlocal buf
+        pos = match.end()
+        with f:
+            while True:
+                pos = separators.match(buf, pos).end()
+                if buf.startswith(']', pos):
+                    return
+                try:
+                    record, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        raise
+                    buf = buf[pos:] + chunk
+                    pos = 0
+                    continue
+                yield record
+                pos = end
+                if pos > chunk_size:
+                    buf = buf[pos:]
+                    pos = 0
+    return seq, records()
+
+# Transactions moved out of the in-memory history, as one gzip JSONL segment
+# per month. archive.json lists the current segment of each month, a sorted
+# array of 64-bit hashes of the archived transaction IDs (for the uniqueness
+# check) and the circulation counts of everything archived. Every other file
+# is written under a new name first, so replacing archive.json commits a run.
+class HistoryArchive:
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_file = os.path.join(directory, 'archive.json')
+        self.manifest = {'run': 0, 'cutoff': None, 'segments': {}, 'ids': None, 'stats': None}
+        self._ids = None
+
+    def load(self):
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r') as f:
+                self.manifest = json.load(f)
+        self._ids = None
+
+    @property
+    def cutoff(self):
+        # Timestamp below which every archived transaction lies, or None
+        return self.manifest['cutoff']
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @staticmethod
+    def id_hash(transaction_id):
+        return int.from_bytes(hashlib.blake2b(transaction_id.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    @property
+    def ids(self):
+        if self._ids is None:
+            self._ids = array('Q')
+            if self.manifest['ids']:
+                with open(self._path(self.manifest['ids']), 'rb') as f:
+                    self._ids.frombytes(f.read())
+        return self._ids
+
+    def contains(self, transaction_id):
+        ids = self.ids
+        if not ids:
+            return False
+        key = self.id_hash(transaction_id)
+        i = bisect.bisect_left(ids, key)
+        return i < len(ids) and ids[i] == key
+
+    def stats_state(self):
+        if not self.manifest['stats']:
+            return None
+        with open(self._path(self.manifest['stats']), 'r') as f:
+            return json.load(f)
+
+    def records(self, start_date=None, end_date=None):
+        # Streams archived records oldest month first, one line at a time;
+        # dates are 'YYYY-MM-DD HH:MM:SS' strings, so they compare as text
+        for month in sorted(self.manifest['segments']):
+            if start_date is not None and month < start_date[:7]:
+                continue
+            if end_date is not None and month > end_date[:7]:
+                break
+            for record in self._read_segment(self.manifest['segments'][month]['file']):
+                if start_date is not None and record['date'] < start_date:
+                    continue
+                if end_date is not None and record['date'] > end_date:
+                    break
+                yield record
+
+    def _read_segment(self, name):
+        with gzip.open(self._path(name), 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    @staticmethod
+    def _write_file(path, write):
+        with open(path, 'wb') as raw:
+            write(raw)
+            raw.flush()
+            os.fsync(raw.fileno())
+
+    def write(self, months, cutoff, stats_state):
+        # months: {'YYYY-MM': [record, ...] sorted by date}. Each touched
+        # month is rewritten as the merge of its old segment and the new records.
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = json.loads(json.dumps(self.manifest))
+        run = manifest['run'] = manifest['run'] + 1
+        replaced = []
+        new_hashes = []
+        for month, records in sorted(months.items()):
+            old = manifest['segments'].get(month)
+            merged = records
+            if old is not None:
+                merged = heapq.merge(self._read_segment(old['file']), records, key=lambda record: record['date'])
+                replaced.append(old['file'])
+            name = f"transactions-{month}.{run}.jsonl.gz"
+
+            def write_segment(raw, merged=merged):
+                # Level 6 compresses text nearly as well as 9 in a third of the time
+                with gzip.open(raw, 'wt', encoding='utf-8', compresslevel=6) as f:
+                    for record in merged:
+                        f.write(json.dumps(record) + '\n')
+            self._write_file(self._path(name), write_segment)
+            manifest['segments'][month] = {'file': name, 'count': len(records) + (old['count'] if old else 0)}
+            new_hashes.extend(self.id_hash(record['transaction_id']) for record in records)
+
+        ids = array('Q', sorted(itertools.chain(self.ids, new_hashes)))
+        ids_name = f"ids.{run}.bin"
+        self._write_file(self._path(ids_name), lambda raw: raw.write(ids.tobytes()))
+        stats_name = f"stats.{run}.json"
+        self._write_file(self._path(stats_name), lambda raw: raw.write(json.dumps(stats_state).encode('utf-8')))
+        replaced.extend(name for name in (manifest['ids'], manifest['stats']) if name)
+        manifest['ids'], manifest['stats'] = ids_name, stats_name
+        manifest['cutoff'] = max(cutoff, manifest['cutoff'] or cutoff)
+
+        tmp_path = self.manifest_file + '.tmp'
+        self._write_file(tmp_path, lambda raw: raw.write(json.dumps(manifest, indent=4).encode('utf-8')))
+        os.replace(tmp_path, self.manifest_file)
+        self.manifest = manifest
+        self._ids = ids
+        for name in replaced:
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+# In-memory inverted index: token -> keys, with a sorted token list for prefix lookups
+class SearchIndex:
+    TOKEN_PATTERN = re.compile(r'\w+')
+
+    def __init__(self):
+        # Postings are dicts used as ordered sets, so results come back in insertion order
+        self.postings = {}
+        self.sorted_tokens = []
+        # New tokens from build(), merged into sorted_tokens by the next search
+        self.unsorted_tokens = []
+        # key -> the key's distinct tokens, to check a common term against a
+        # few candidates without walking its postings
+        self.key_tokens = {}
+
+    @classmethod
+    def tokenize(cls, text):
+        return cls.TOKEN_PATTERN.findall(text.lower())
+
+    def _index(self, key, texts):
+        tokens = tuple(set(self.TOKEN_PATTERN.findall(' '.join(texts).lower())))
+        self.key_tokens[key] = tokens
+        postings = self.postings
+        new_tokens = []
+        for token in tokens:
+            keys = postings.get(token)
+            if keys is None:
+                postings[token] = {key: None}
+                new_tokens.append(token)
+            else:
+                keys[key] = None
+        return new_tokens
+
+    def add(self, key, *texts):
+        for token in self._index(key, texts):
+            bisect.insort(self.sorted_tokens, token)
+
+    def remove(self, key):
+        tokens = self.key_tokens.pop(key, None)
+        if tokens is None:
+            return
+        for token in tokens:
+            keys = self.postings[token]
+            del keys[key]
+            if keys:
+                continue
+            del self.postings[token]
+            i = bisect.bisect_left(self.sorted_tokens, token)
+            if i < len(self.sorted_tokens) and self.sorted_tokens[i] == token:
+                del self.sorted_tokens[i]
+            else:
+                self.unsorted_tokens.remove(token)
+
+    def build(self, entries):
+        # entries: iterable of (key, text, ...); the vocabulary is sorted lazily
+        for key, *texts in entries:
+            self.unsorted_tokens.extend(self._index(key, texts))
+
+    def prefix_tokens(self, prefix):
+        if self.unsorted_tokens:
+            # Two sorted runs, which the list sort merges in linear time
+            self.unsorted_tokens.sort()
+            self.sorted_tokens.extend(self.unsorted_tokens)
+            self.sorted_tokens.sort()
+            self.unsorted_tokens = []
+        i = bisect.bisect_left(self.sorted_tokens, prefix)
+        while i < len(self.sorted_tokens) and self.sorted_tokens[i].startswith(prefix):
+            yield self.sorted_tokens[i]
+            i += 1
+
+    def search(self, query, limit=50):
+        # Every query term matches as a prefix of some token of the key
+        terms = self.tokenize(query)
+        if not terms:
+            return []
+        postings = self.postings
+        # (number of postings, prefix tokens, term), most selective term first
+        plans = []
+        for term in dict.fromkeys(terms):
+            tokens = list(self.prefix_tokens(term))
+            plans.append((sum(len(postings[token]) for token in tokens), tokens, term))
+        plans.sort(key=lambda plan: plan[0])
+        if plans[0][0] == 0:
+            return []
+        # Walk the most selective term's postings through one membership
+        # test per other term, stopping at the limit. A term with a single
+        # token is tested against its postings dict. A prefix with several
+        # tokens is tested against their union when the walk will likely go
+        # the whole way (too few matches expected to reach the limit) and
+        # its tokens have few postings, else against each key's own tokens.
+        keys = itertools.chain.from_iterable(postings[token] for token in plans[0][1])
+        key_tokens = self.key_tokens
+        expected = plans[0][0]
+        for size, _, _ in plans[1:]:
+            expected *= size / len(key_tokens)
+        for size, tokens, term in plans[1:]:
+            if len(tokens) == 1:
+                keys = filter(postings[tokens[0]].__contains__, keys)
+            elif expected < limit and size <= 2 * plans[0][0]:
+                matches = set()
+                for token in tokens:
+                    matches.update(postings[token])
+                keys = filter(matches.__contains__, keys)
+            else:
+                keys = filter(lambda key, term=term: any(tok.startswith(term) for tok in key_tokens[key]), keys)
+        # A key under several of the first term's tokens comes up once each
+        results = []
+        seen = set()
+        for key in itertools.filterfalse(seen.__contains__, keys):
+            seen.add(key)
+            results.append(key)
+            if len(results) >= limit:
+                break
+        return results
+
+# Append-only journal of library mutations (one JSON record per line)
+class Journal:
+    FSYNC_POLICIES = ('always', 'batch', 'never')
+
+    def __init__(self, path, fsync_policy='always', batch_size=100):
+        if fsync_policy not in self.FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        self.path = path
+        self.fsync_policy = fsync_policy
+        self.batch_size = batch_size
+        self.size = 0
+        self.unsynced = 0
+        self.file = None
+
+    def replay(self):
+        records = []
+        good_offset = 0
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    # A crash mid-append leaves a torn last line; drop it
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+                    good_offset += len(line)
+            if good_offset < os.path.getsize(self.path):
+                with open(self.path, 'r+b') as f:
+                    f.truncate(good_offset)
+        self.size = len(records)
+        return records
+
+    def open(self):
+        if self.file is None:
+            self.file = open(self.path, 'ab')
+
+    def append(self, record):
+        self.append_many([record])
+
+    @timed('journal.append')
+    def append_many(self, records):
+        # One write and at most one fsync for the whole group
+        self.open()
+        data = ''.join(json.dumps(record) + '\n' for record in records).encode('utf-8')
+        self.file.write(data)
+        self.file.flush()
+        METRICS.increment('journal.bytes', len(data))
+        self.size += len(records)
+        if self.fsync_policy == 'always':
+            self.sync()
+        elif self.fsync_policy == 'batch':
+            self.unsynced += len(records)
+            if self.unsynced >= self.batch_size:
+                self.sync()
+
+    @timed('journal.fsync')
+    def sync(self):
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def reset(self):
+        self.open()
+        self.file.seek(0)
+        self.file.truncate()
+        self.sync()
+        self.size = 0
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+# Write-behind thread: runs persistence tasks in order, off the caller's thread
+class PersistenceWorker:
+    def __init__(self, max_pending=10000):
+        # Bounded, so a stalled disk slows writers down instead of growing memory
+        self.tasks = queue.Queue(maxsize=max_pending)
+        self.save_queued = False
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='library-persistence', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            task = self.tasks.get()
+            try:
+                if task is None:
+                    return
+                task()
+            except Exception as e:
+                # Keep the worker alive; the error surfaces on the next flush()
+                self.error = e
+            finally:
+                self.tasks.task_done()
+
+    def submit(self, task):
+        self.tasks.put(task)
+
+    def submit_save(self, save):
+        # Back-to-back save requests collapse into the one still waiting in the queue
+        if self.save_queued:
+            return
+        self.save_queued = True
 
-# Library System with file handling
-class LibrarySystem:
-    def __init__(self, books_file='books.json', members_file='members.json', transactions_file='transactions.json'):
+        def run():
+            self.save_queued = False
+            save()
+        self.submit(run)
+
+    def pending(self):
+        return self.tasks.unfinished_tasks
+
+    def flush(self):
+        self.tasks.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.submit(None)
+            self.thread.join()
+
+# Storage backends
+class StorageBackend(ABC):
+    # Backends expose `books` and `members` as mappings keyed by ID and
+    # `transactions` as a sequence in insertion order
+    @abstractmethod
+    def load(self):
+        pass
+
+    @abstractmethod
+    def commit(self, record):
+        pass
+
+    def commit_batch(self, records):
+        for record in records:
+            self.commit(record)
+
+    @abstractmethod
+    def save(self):
+        pass
+
+    @abstractmethod
+    def transactions_for_member(self, member_id):
+        pass
+
+    @abstractmethod
+    def transactions_for_book(self, book_id):
+        pass
+
+    @abstractmethod
+    def transactions_between(self, start_date, end_date):
+        pass
+
+    @abstractmethod
+    def books_page(self, start, stop):
+        pass
+
+    @abstractmethod
+    def get_transaction(self, transaction_id):
+        pass
+
+    def transaction_exists(self, transaction_id):
+        return self.get_transaction(transaction_id) is not None
+
+    def iter_history(self, start_date=None, end_date=None):
+        # Streams the history as record dicts, oldest first; bounds are full
+        # 'YYYY-MM-DD HH:MM:SS' dates
+        for t in self.transactions:
+            if start_date is not None and t.date < start_date or end_date is not None and t.date > end_date:
+                continue
+            record = {'transaction_id': t.transaction_id, 'member_id': t.member_id, 'book_id': t.book_id, 'date': t.date,
+                      'type': 'return' if isinstance(t, ReturnTransaction) else 'borrow'}
+            if isinstance(t, BorrowTransaction):
+                record['due_date'] = t.due_date
+            yield record
+
+    def archive(self, cutoff_date, keep=()):
+        raise ValueError("This storage backend does not support archiving.")
+
+    def archived_stats(self):
+        return None
+
+    def archived_fines(self):
+        # member_id -> fines charged on archived returns
+        return {}
+
+    def history_loaded(self):
+        return True
+
+    def flush(self):
+        pass
+
+    def pending_writes(self):
+        return 0
+
+    def close(self):
+        pass
+
+def make_transaction(t_type, transaction_id, member_id, book_id, date, due_date=None, fine=0):
+    if t_type == 'borrow':
+        return BorrowTransaction(transaction_id, member_id, book_id, date, due_date)
+    return ReturnTransaction(transaction_id, member_id, book_id, date, fine)
+
+# JSON snapshot files plus an append-only journal, all held in memory
+class JSONStorage(StorageBackend):
+    def __init__(self, books_file='books.json', members_file='members.json', transactions_file='transactions.json',
+                 journal_file='library.journal', fsync_policy='always', snapshot_every=1000, background=False,
+                 history_format='json', archive_dir=None):
+        if history_format not in ('json', 'binary'):
+            raise ValueError(f"Unknown history format: {history_format}")
         self.books_file = books_file
         self.members_file = members_file
         self.transactions_file = transactions_file
+        # history_format='binary' snapshots the history as columns in a .bin file
+        self.history_format = history_format
+        self.history_bin_file = os.path.splitext(transactions_file)[0] + '.bin'
+        self.snapshot_every = snapshot_every
+        # Transactions older than the hot window, see archive()
+        if archive_dir is None:
+            archive_dir = os.path.join(os.path.dirname(transactions_file), 'archive')
+        self.history_archive = HistoryArchive(archive_dir)
+        self.journal = Journal(journal_file, fsync_policy)
+        # With background=True the journal and snapshots are written by a worker thread
+        self.worker = PersistenceWorker() if background else None
+        # Held while mutating memory and while the worker copies it for a snapshot
+        self.lock = threading.RLock()
+        self.since_snapshot = 0
+        # Records in the last snapshot; a snapshot costs O(data), so the journal
+        # may grow to that size first and each record stays O(1) amortized
+        self.snapshot_size = 0
 
         self.books = {}
+        # Book IDs in insertion order, for paging through the catalog
+        self.book_ids = []
         self.members = {}
-        self.transactions = []
-
-        self.load_data()
-
-    def load_data(self):
+        # The history is loaded on first use; until then journal records for
+        # it wait in deferred_history
+        self._transactions = None
+        self.deferred_history = []
+        # transaction_id -> position in self.transactions
+        self.transactions_by_id = {}
+        self.transactions_seq = 0
+        # Sequence number of the last mutation applied
+        self.seq = 0
+
+    @staticmethod
+    def _read_snapshot(path):
+        if not os.path.exists(path):
+            return 0, []
+        with open(path, 'r') as f:
+            data = json.load(f)
+        # Plain lists are snapshots written before the journal existed
+        if isinstance(data, list):
+            return 0, data
+        return data['seq'], data['records']
+
+    @staticmethod
+    def _write_snapshot(path, seq, records):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'seq': seq, 'records': records}, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @timed('storage.load')
+    def load(self):
         # Load books
-        if os.path.exists(self.books_file):
-            with open(self.books_file, 'r') as f:
-                books_data = json.load(f)
-                for b in books_data:
-                    book = Book(b['item_id'], b['title'], b['author'], b['total_copies'])
-                    book.available_copies = b.get('available_copies', book.total_copies)
-                    self.books[book.item_id] = book
+        books_seq, books_data = self._read_snapshot(self.books_file)
+        for b in books_data:
+            book = Book(b['item_id'], b['title'], b['author'], b['total_copies'])
+            book.available_copies = b.get('available_copies', book.total_copies)
+            self.books[book.item_id] = book
+            self.book_ids.append(book.item_id)
 
         # Load members
-        if os.path.exists(self.members_file):
-            with open(self.members_file, 'r') as f:
-                members_data = json.load(f)
-                for m in members_data:
-                    member = Member(m['member_id'], m['name'])
-                    self.members[member.member_id] = member
-
-        # Load transactions
+        members_seq, members_data = self._read_snapshot(self.members_file)
+        for m in members_data:
+            member = Member(m['member_id'], m['name'])
+            self.members[member.member_id] = member
+
+        self.history_archive.load()
+
+        # Only the history's sequence number is read now; see load_history
+        transactions_seq = self.transactions_seq = self._read_history_seq()
+
+        self.seq = max(books_seq, members_seq, transactions_seq)
+        self.snapshot_size = len(self.books) + len(self.members)
+
+        # Replay the journal tail; each snapshot file is replaced on its own,
+        # so skip the parts of a record that a newer snapshot already holds
+        for record in self.journal.replay():
+            skip = set()
+            if record['seq'] <= books_seq:
+                skip.add('books')
+            if record['seq'] <= members_seq:
+                skip.add('members')
+            if record['seq'] <= transactions_seq:
+                skip.add('transactions')
+            self._apply(record, skip)
+            self.seq = max(self.seq, record['seq'])
+        self.journal.open()
+
+    def _history_source(self):
+        if self.history_format == 'binary' and os.path.exists(self.history_bin_file):
+            return 'binary'
         if os.path.exists(self.transactions_file):
-            with open(self.transactions_file, 'r') as f:
-                transactions_data = json.load(f)
-                for t in transactions_data:
-                    if t['type'] == 'borrow':
-                        trans = BorrowTransaction(t['transaction_id'], t['member_id'], t['book_id'], t['date'])
-                    else:
-                        trans = ReturnTransaction(t['transaction_id'], t['member_id'], t['book_id'], t['date'])
-                    self.transactions.append(trans)
+            return 'json'
+        return None
+
+    def _read_history_seq(self):
+        source = self._history_source()
+        if source == 'binary':
+            return TransactionStore.read_binary_seq(self.history_bin_file)
+        if source == 'json':
+            seq, records = stream_json_snapshot(self.transactions_file)
+            records.close()
+            return seq
+        return 0
+
+    @property
+    def transactions(self):
+        if self._transactions is None:
+            self.load_history()
+        return self._transactions
+
+    def history_loaded(self):
+        return self._transactions is not None
+
+    @timed('storage.load_history')
+    def load_history(self):
+        with self.lock:
+            if self._transactions is not None:
+                return
+            source = self._history_source()
+            if source == 'binary':
+                _, store = TransactionStore.read_binary(self.history_bin_file)
+                self._transactions = store
+                for index, transaction_id in enumerate(store.transaction_ids):
+                    self.transactions_by_id.setdefault(transaction_id, index)
+            else:
+                self._transactions = TransactionStore()
+                if source == 'json':
+                    _, records = stream_json_snapshot(self.transactions_file)
+                    for t in records:
+                        self._add_transaction(t['type'], t['transaction_id'], t['member_id'], t['book_id'], t['date'],
+                                              t.get('due_date'), t.get('fine', 0))
+            for record in self.deferred_history:
+                if record['op'] == 'void':
+                    self._void_transaction(record['transaction_id'])
+                else:
+                    self._add_transaction(record['op'], record['transaction_id'], record['member_id'], record['book_id'],
+                                          record['date'], record.get('due_date'), record.get('fine', 0))
+            self.deferred_history = []
+            self._drop_archived()
+
+    def _drop_archived(self):
+        # After a crash between an archive run and the next snapshot, the
+        # snapshot and journal still hold the archived rows; their IDs are in
+        # the archive, which no hot transaction's ID can be
+        cutoff = self.history_archive.cutoff
+        if cutoff is None:
+            return
+        store = self._transactions
+        archived = [i for i, ts in enumerate(store.timestamps)
+                    if ts < cutoff and self.history_archive.contains(store.transaction_ids[i])]
+        if archived:
+            archived = set(archived)
+            self._set_history(store.subset(i for i in range(len(store)) if i not in archived))
+
+    def _set_history(self, store):
+        self._transactions = store
+        self.transactions_by_id = {}
+        for index, transaction_id in enumerate(store.transaction_ids):
+            self.transactions_by_id.setdefault(transaction_id, index)
+
+    @timed('storage.archive')
+    def archive(self, cutoff_date, keep=()):
+        # Moves transactions dated before cutoff_date into the archive, except
+        # the IDs in keep (open loans), and returns how many were moved
+        self.flush()
+        with self.lock:
+            store = self.transactions
+            cutoff = date_to_timestamp(cutoff_date)
+            moved, kept = [], []
+            for i, ts in enumerate(store.timestamps):
+                (moved if ts < cutoff and store.transaction_ids[i] not in keep else kept).append(i)
+            if not moved:
+                return 0
+            months = {}
+            for i in moved:
+                record = store.record(i)
+                months.setdefault(record['date'][:7], []).append(record)
+            for records in months.values():
+                records.sort(key=lambda record: record['date'])
+            members, books = store.member_table.strings, store.book_table.strings
+            archived = self.history_archive.stats_state()
+            stats = CirculationStats()
+            stats.build((('return' if store.flags[i] & store.RETURN_FLAG else 'borrow', members[store.member_codes[i]],
+                          books[store.book_codes[i]], store.timestamps[i] // SECONDS_PER_DAY) for i in moved), archived)
+            # The fines charged on archived returns are kept with the counts,
+            # since the loan index only reads the hot window
+            fines = dict(archived['fines']) if archived else {}
+            for i in moved:
+                if store.fines[i]:
+                    member_id = members[store.member_codes[i]]
+                    fines[member_id] = fines.get(member_id, 0) + store.fines[i]
+            state = stats.state()
+            state['fines'] = fines
+            self.history_archive.write(months, cutoff, state)
+            self._set_history(store.subset(kept))
+        self.save()
+        return len(moved)
+
+    def archived_stats(self):
+        return self.history_archive.stats_state()
+
+    def archived_fines(self):
+        state = self.history_archive.stats_state()
+        return state['fines'] if state else {}
+
+    def iter_history(self, start_date=None, end_date=None):
+        # The archive month by month, then the hot window
+        yield from self.history_archive.records(start_date, end_date)
+        store = self.transactions
+        start = date_to_timestamp(start_date) if start_date is not None else None
+        end = date_to_timestamp(end_date) if end_date is not None else None
+        for i in range(len(store)):
+            ts = store.timestamps[i]
+            if start is not None and ts < start or end is not None and ts > end:
+                continue
+            yield store.record(i)
+
+    def save(self):
+        self.since_snapshot = 0
+        if self.worker is not None:
+            self.worker.submit_save(self._write_snapshots)
+        else:
+            self._write_snapshots()
+
+    @timed('storage.write_snapshots')
+    def _write_snapshots(self):
+        # Copy a consistent view of memory, then write a full snapshot of every
+        # file and start a fresh journal. Records queued after this point with
+        # seq <= the snapshot's are skipped on replay.
+        with self.lock:
+            seq = self.seq
+            books_data = []
+            for book in self.books.values():
+                books_data.append({
+                    'item_id': book.item_id,
+                    'title': book.title,
+                    'author': book.author,
+                    'total_copies': book.total_copies,
+                    'available_copies': book.available_copies
+                })
+            members_data = []
+            for member in self.members.values():
+                members_data.append({
+                    'member_id': member.member_id,
+                    'name': member.name
+                })
+            # The journal is about to be truncated, so the history has to be
+            # loaded to carry its tail into the new snapshot
+            if self.history_format == 'binary':
+                history = TransactionStore()
+                for column in ('transaction_ids', 'member_codes', 'book_codes', 'timestamps', 'flags', 'due_timestamps', 'fines'):
+                    getattr(history, column).extend(getattr(self.transactions, column))
+                history.member_table.strings = list(self.transactions.member_table.strings)
+                history.book_table.strings = list(self.transactions.book_table.strings)
+            else:
+                history = list(self.transactions.records())
+
+        self._write_snapshot(self.books_file, seq, books_data)
+        self._write_snapshot(self.members_file, seq, members_data)
+        if self.history_format == 'binary':
+            history.write_binary(self.history_bin_file, seq)
+        else:
+            self._write_snapshot(self.transactions_file, seq, history)
+        self.transactions_seq = seq
+        self.snapshot_size = len(books_data) + len(members_data) + len(history)
+        self.journal.reset()
+        if METRICS.enabled:
+            history_file = self.history_bin_file if self.history_format == 'binary' else self.transactions_file
+            METRICS.record_size('save.bytes', sum(os.path.getsize(path) for path in
+                                                 (self.books_file, self.members_file, history_file)))
+
+    def flush(self):
+        if self.worker is not None:
+            self.worker.flush()
+        self.journal.sync()
+
+    def pending_writes(self):
+        return self.worker.pending() if self.worker is not None else 0
+
+    def close(self):
+        try:
+            if self.worker is not None:
+                self.worker.close()
+        finally:
+            self.journal.close()
+
+    def _apply(self, record, skip=()):
+        op = record['op']
+        if op == 'add_book':
+            if 'books' not in skip:
+                self.books[record['item_id']] = Book(record['item_id'], record['title'], record['author'], record['total_copies'])
+                self.book_ids.append(record['item_id'])
+        elif op == 'add_member':
+            if 'members' not in skip:
+                self.members[record['member_id']] = Member(record['member_id'], record['name'])
+        elif op == 'remove_book':
+            if 'books' not in skip:
+                item_id = record['item_id']
+                del self.books[item_id]
+                # Undo removes the newest books first
+                if self.book_ids[-1] == item_id:
+                    self.book_ids.pop()
+                else:
+                    self.book_ids.remove(item_id)
+        elif op == 'remove_member':
+            if 'members' not in skip:
+                del self.members[record['member_id']]
+        elif op == 'void':
+            if 'books' not in skip:
+                self.books[record['book_id']].available_copies += 1 if record['type'] == 'borrow' else -1
+            if 'transactions' not in skip:
+                if self._transactions is None:
+                    self.deferred_history.append(record)
+                else:
+                    self._void_transaction(record['transaction_id'])
+        elif op in ('borrow', 'return'):
+            if 'books' not in skip:
+                self.books[record['book_id']].available_copies += -1 if op == 'borrow' else 1
+            if 'transactions' not in skip:
+                if self._transactions is None:
+                    self.deferred_history.append(record)
+                else:
+                    self._add_transaction(op, record['transaction_id'], record['member_id'], record['book_id'], record['date'],
+                                          record.get('due_date'), record.get('fine', 0))
+
+    def _void_transaction(self, transaction_id):
+        # Undo only ever voids the newest transaction
+        store = self._transactions
+        index = len(store) - 1
+        if index < 0 or store.transaction_ids[index] != transaction_id:
+            raise ValueError(f"Transaction {transaction_id} is not the newest and cannot be voided.")
+        store.pop()
+        if self.transactions_by_id.get(transaction_id) == index:
+            del self.transactions_by_id[transaction_id]
+
+    def _add_transaction(self, t_type, transaction_id, member_id, book_id, date, due_date=None, fine=0):
+        # Older histories may repeat an ID; the first record keeps it
+        self.transactions_by_id.setdefault(transaction_id, len(self.transactions))
+        self.transactions.append(t_type, transaction_id, member_id, book_id, date, due_date, fine)
+
+    def commit(self, record):
+        self.commit_batch([record])
+
+    @timed('storage.commit')
+    def commit_batch(self, records):
+        if not records:
+            return
+        with self.lock:
+            for offset, record in enumerate(records, 1):
+                record['seq'] = self.seq + offset
+            if self.worker is None:
+                # Write-ahead: the records are durable before memory changes
+                self.journal.append_many(records)
+            self.seq += len(records)
+            for record in records:
+                self._apply(record)
+        if self.worker is not None:
+            # Write-behind: memory has changed, the worker appends in order
+            self.worker.submit(lambda: self.journal.append_many(records))
+        self.since_snapshot += len(records)
+        if self.since_snapshot >= max(self.snapshot_every, self.snapshot_size):
+            self.save()
+
+    def transactions_for_member(self, member_id):
+        return self.transactions.select_member(member_id)
+
+    def transactions_for_book(self, book_id):
+        return self.transactions.select_book(book_id)
+
+    def transactions_between(self, start_date, end_date):
+        return self.transactions.select_between(start_date, end_date)
+
+    def books_page(self, start, stop):
+        return [self.books[item_id] for item_id in self.book_ids[start:stop]]
+
+    def get_transaction(self, transaction_id):
+        transactions = self.transactions
+        index = self.transactions_by_id.get(transaction_id)
+        return transactions[index] if index is not None else None
+
+    def transaction_exists(self, transaction_id):
+        if self._transactions is None:
+            self.load_history()
+        return transaction_id in self.transactions_by_id or self.history_archive.contains(transaction_id)
+
+# Read-only views over SQLite tables, so nothing is cached in Python
+class SQLiteBooks(Mapping):
+    def __init__(self, conn):
+        self.conn = conn
+
+    @staticmethod
+    def _row_to_book(row):
+        book = Book(row[0], row[1], row[2], row[3])
+        book.available_copies = row[4]
+        return book
+
+    def __getitem__(self, item_id):
+        row = self.conn.execute("SELECT item_id, title, author, total_copies, available_copies FROM books WHERE item_id = ?", (item_id,)).fetchone()
+        if row is None:
+            raise KeyError(item_id)
+        return self._row_to_book(row)
+
+    def __contains__(self, item_id):
+        return self.conn.execute("SELECT 1 FROM books WHERE item_id = ?", (item_id,)).fetchone() is not None
+
+    def __iter__(self):
+        for row in self.conn.execute("SELECT item_id FROM books ORDER BY rowid"):
+            yield row[0]
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+    def values(self):
+        for row in self.conn.execute("SELECT item_id, title, author, total_copies, available_copies FROM books ORDER BY rowid"):
+            yield self._row_to_book(row)
+
+class SQLiteMembers(Mapping):
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __getitem__(self, member_id):
+        row = self.conn.execute("SELECT member_id, name FROM members WHERE member_id = ?", (member_id,)).fetchone()
+        if row is None:
+            raise KeyError(member_id)
+        return Member(row[0], row[1])
+
+    def __contains__(self, member_id):
+        return self.conn.execute("SELECT 1 FROM members WHERE member_id = ?", (member_id,)).fetchone() is not None
+
+    def __iter__(self):
+        for row in self.conn.execute("SELECT member_id FROM members ORDER BY rowid"):
+            yield row[0]
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM members").fetchone()[0]
+
+    def values(self):
+        for row in self.conn.execute("SELECT member_id, name FROM members ORDER BY rowid"):
+            yield Member(row[0], row[1])
+
+class SQLiteTransactions(Sequence):
+    COLUMNS = "type, transaction_id, member_id, book_id, date, due_date, fine"
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+    def __getitem__(self, index):
+        # Only the newest row is ever deleted (by undo), so position i is rowid i + 1
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            rows = self.conn.execute(f"SELECT {self.COLUMNS} FROM transactions WHERE id > ? AND id <= ? ORDER BY id", (start, stop)).fetchall()
+            return [make_transaction(*row) for row in rows][::step]
+        if index < 0:
+            index += len(self)
+        row = self.conn.execute(f"SELECT {self.COLUMNS} FROM transactions WHERE id = ?", (index + 1,)).fetchone()
+        if row is None:
+            raise IndexError("transaction index out of range")
+        return make_transaction(*row)
+
+    def __iter__(self):
+        for row in self.conn.execute(f"SELECT {self.COLUMNS} FROM transactions ORDER BY id"):
+            yield make_transaction(*row)
+
+    def loan_events(self):
+        # Returns have no due date
+        return self.conn.execute("SELECT type, transaction_id, member_id, book_id, CAST(strftime('%s', due_date) AS INTEGER), "
+                                 "fine FROM transactions ORDER BY id")
+
+    def circulation_events(self):
+        # 2440587.5 is the Julian day of 1970-01-01 00:00, the EPOCH
+        return self.conn.execute("SELECT type, member_id, book_id, CAST(julianday(date) - 2440587.5 AS INTEGER) "
+                                 "FROM transactions ORDER BY id")
+
+# Local SQLite database in WAL mode with indexed lookups
+class SQLiteStorage(StorageBackend):
+    SYNCHRONOUS = {'always': 'FULL', 'batch': 'NORMAL', 'never': 'OFF'}
+
+    def __init__(self, db_file='library.db', fsync_policy='batch'):
+        if fsync_policy not in self.SYNCHRONOUS:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        self.db_file = db_file
+        self.fsync_policy = fsync_policy
+        self.conn = None
+
+    @timed('storage.load')
+    def load(self):
+        self.conn = sqlite3.connect(self.db_file)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={self.SYNCHRONOUS[self.fsync_policy]}")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS books (
+                    item_id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    author TEXT NOT NULL,
+                    total_copies INTEGER NOT NULL,
+                    available_copies INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS members (
+                    member_id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS transactions (
+                    id INTEGER PRIMARY KEY,
+                    transaction_id TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    member_id TEXT NOT NULL,
+                    book_id TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    due_date TEXT,
+                    fine INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_transactions_member ON transactions (member_id);
+                CREATE INDEX IF NOT EXISTS idx_transactions_book ON transactions (book_id);
+                CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date);
+                CREATE INDEX IF NOT EXISTS idx_transactions_id ON transactions (transaction_id);
+            """)
+        self.books = SQLiteBooks(self.conn)
+        self.members = SQLiteMembers(self.conn)
+        self.transactions = SQLiteTransactions(self.conn)
+
+    def commit(self, record):
+        self.commit_batch([record])
+
+    @timed('storage.commit')
+    def commit_batch(self, records):
+        # One SQLite transaction for the whole batch
+        with self.conn:
+            for record in records:
+                self._execute(record)
+
+    def _execute(self, record):
+        op = record['op']
+        if op == 'add_book':
+            self.conn.execute("INSERT INTO books VALUES (?, ?, ?, ?, ?)",
+                              (record['item_id'], record['title'], record['author'], record['total_copies'], record['total_copies']))
+        elif op == 'add_member':
+            self.conn.execute("INSERT INTO members VALUES (?, ?)", (record['member_id'], record['name']))
+        elif op == 'remove_book':
+            self.conn.execute("DELETE FROM books WHERE item_id = ?", (record['item_id'],))
+        elif op == 'remove_member':
+            self.conn.execute("DELETE FROM members WHERE member_id = ?", (record['member_id'],))
+        elif op == 'void':
+            self.conn.execute("UPDATE books SET available_copies = available_copies + ? WHERE item_id = ?",
+                              (1 if record['type'] == 'borrow' else -1, record['book_id']))
+            self.conn.execute("DELETE FROM transactions WHERE id = (SELECT MAX(id) FROM transactions WHERE transaction_id = ?)",
+                              (record['transaction_id'],))
+        elif op in ('borrow', 'return'):
+            self.conn.execute("UPDATE books SET available_copies = available_copies + ? WHERE item_id = ?",
+                              (-1 if op == 'borrow' else 1, record['book_id']))
+            self.conn.execute("INSERT INTO transactions (transaction_id, type, member_id, book_id, date, due_date, fine) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (record['transaction_id'], op, record['member_id'], record['book_id'], record['date'], record.get('due_date'),
+                               record.get('fine', 0)))
+
+    def save(self):
+        # Every commit is already durable; fold the WAL back into the database
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def _query_transactions(self, where, params):
+        rows = self.conn.execute(f"SELECT {SQLiteTransactions.COLUMNS} FROM transactions WHERE {where} ORDER BY id", params)
+        return [make_transaction(*row) for row in rows]
+
+    def transactions_for_member(self, member_id):
+        return self._query_transactions("member_id = ?", (member_id,))
+
+    def transactions_for_book(self, book_id):
+        return self._query_transactions("book_id = ?", (book_id,))
+
+    def transactions_between(self, start_date, end_date):
+        return self._query_transactions("date BETWEEN ? AND ?", (start_date, end_date))
+
+    def books_page(self, start, stop):
+        # Only the newest books are ever deleted (by undo), so position i is rowid i + 1
+        rows = self.conn.execute("SELECT item_id, title, author, total_copies, available_copies FROM books WHERE rowid > ? AND rowid <= ? ORDER BY rowid",
+                                 (start, stop))
+        return [SQLiteBooks._row_to_book(row) for row in rows]
+
+    def get_transaction(self, transaction_id):
+        row = self.conn.execute(f"SELECT {SQLiteTransactions.COLUMNS} FROM transactions WHERE transaction_id = ? ORDER BY id LIMIT 1",
+                                (transaction_id,)).fetchone()
+        return make_transaction(*row) if row is not None else None
+
+# Open loans indexed by member and by book, oldest first, and by due date,
+# plus the fines charged on late returns
+class LoanIndex:
+    def __init__(self, charged=None):
+        # member_id -> {borrow transaction_id: book_id}
+        self.by_member = {}
+        # book_id -> {borrow transaction_id: member_id}
+        self.by_book = {}
+        # borrow transaction_id -> (member_id, book_id, due timestamp)
+        self.by_id = {}
+        # [(due timestamp, transaction_id)] kept sorted, so the overdue loans
+        # are always a prefix
+        self.by_due = []
+        # member_id -> fines charged on returns, starting from those of the
+        # archived history
+        self.charged = dict(charged or {})
+
+    def _open(self, transaction_id, member_id, book_id, due):
+        self.by_member.setdefault(member_id, {})[transaction_id] = book_id
+        self.by_book.setdefault(book_id, {})[transaction_id] = member_id
+        self.by_id[transaction_id] = (member_id, book_id, due)
+
+    def borrow(self, transaction_id, member_id, book_id, due):
+        if transaction_id in self.by_id:
+            return
+        self._open(transaction_id, member_id, book_id, due)
+        # New loans are usually due last, so this is mostly an append
+        bisect.insort(self.by_due, (due, transaction_id))
+
+    def find(self, member_id, book_id):
+        for transaction_id, loan_book_id in self.by_member.get(member_id, {}).items():
+            if loan_book_id == book_id:
+                return transaction_id
+        return None
+
+    def _close(self, transaction_id, member_id, book_id):
+        del self.by_member[member_id][transaction_id]
+        if not self.by_member[member_id]:
+            del self.by_member[member_id]
+        del self.by_book[book_id][transaction_id]
+        if not self.by_book[book_id]:
+            del self.by_book[book_id]
+        return self.by_id.pop(transaction_id)[2]
+
+    def close(self, transaction_id, member_id, book_id, fine=0):
+        due = self._close(transaction_id, member_id, book_id)
+        del self.by_due[bisect.bisect_left(self.by_due, (due, transaction_id))]
+        self.charge(member_id, fine)
+
+    def charge(self, member_id, fine):
+        # A negative fine takes back one charged before (undo)
+        if fine:
+            total = self.charged.get(member_id, 0) + fine
+            if total:
+                self.charged[member_id] = total
+            else:
+                del self.charged[member_id]
+
+    def overdue(self, now):
+        # [(due, transaction_id)] of loans due before the timestamp now,
+        # most overdue first, in O(log n + k)
+        return self.by_due[:bisect.bisect_left(self.by_due, (now,))]
+
+    def build(self, events):
+        # events: (type, transaction_id, member_id, book_id, due, fine) in history order
+        self._replay(events)
+        self._sort_due()
+
+    def iter_build(self, events, chunk_size=5000):
+        # build() a chunk of events at a time, yielding in between
+        events = iter(events)
+        while True:
+            chunk = list(itertools.islice(events, chunk_size))
+            if not chunk:
+                break
+            self._replay(chunk)
+            yield
+        self._sort_due()
+
+    def _replay(self, events):
+        for t_type, transaction_id, member_id, book_id, due, fine in events:
+            if t_type == 'borrow':
+                self._open(transaction_id, member_id, book_id, due)
+            else:
+                # Returns without a matching borrow in older histories are ignored
+                loan_id = self.find(member_id, book_id)
+                if loan_id is not None:
+                    self._close(loan_id, member_id, book_id)
+                self.charge(member_id, fine)
+
+    def _sort_due(self):
+        self.by_due = sorted((due, transaction_id) for transaction_id, (_, _, due) in self.by_id.items())
+
+# Counts that only grow, with the largest `size` of them kept in order as
+# they change, so the top of the ranking is read without sorting
+class TopCounter:
+    __slots__ = ('size', 'counts', 'top', 'top_keys')
+
+    def __init__(self, size=100):
+        self.size = size
+        self.counts = {}
+        # [(count, key)], largest first
+        self.top = []
+        self.top_keys = set()
+
+    def add(self, key, amount=1):
+        count = self.counts.get(key, 0) + amount
+        self.counts[key] = count
+        if key in self.top_keys:
+            for i, (_, top_key) in enumerate(self.top):
+                if top_key == key:
+                    self.top[i] = (count, key)
+                    break
+        elif len(self.top) < self.size or count > self.top[-1][0]:
+            self.top.append((count, key))
+            self.top_keys.add(key)
+        else:
+            return
+        self.top.sort(key=lambda entry: -entry[0])
+        if len(self.top) > self.size:
+            self.top_keys.discard(self.top.pop()[1])
+
+    def rebuild(self):
+        self.top = [(count, key) for key, count in heapq.nlargest(self.size, self.counts.items(), key=lambda item: item[1])]
+        self.top_keys = {key for _, key in self.top}
+
+    def most_common(self, limit=10):
+        return [(key, count) for count, key in self.top[:limit]]
+
+# Circulation aggregates per book, member, month and day, kept up to date on
+# every borrow and return so reports never rescan the history
+class CirculationStats:
+    def __init__(self, top_size=100):
+        self.top_size = top_size
+        self.book_borrows = TopCounter(top_size)
+        self.member_borrows = TopCounter(top_size)
+        # 'YYYY-MM' -> TopCounter of book borrows that month
+        self.monthly_books = {}
+        # day number since EPOCH -> [borrows, returns]
+        self.daily = {}
+        self.months = {}
+
+    def month(self, day):
+        month = self.months.get(day)
+        if month is None:
+            month = self.months[day] = (EPOCH + timedelta(days=day)).strftime("%Y-%m")
+        return month
+
+    def record(self, t_type, member_id, book_id, day):
+        counts = self.daily.get(day)
+        if counts is None:
+            counts = self.daily[day] = [0, 0]
+        if t_type == 'borrow':
+            counts[0] += 1
+            self.book_borrows.add(book_id)
+            self.member_borrows.add(member_id)
+            month = self.month(day)
+            monthly = self.monthly_books.get(month)
+            if monthly is None:
+                monthly = self.monthly_books[month] = TopCounter(self.top_size)
+            monthly.add(book_id)
+        else:
+            counts[1] += 1
+
+    def build(self, events, state=None):
+        # events: (type, member_id, book_id, day) in any order; counts first,
+        # then each ranking is built once. state adds counts saved by state().
+        book_counts, member_counts = self.book_borrows.counts, self.member_borrows.counts
+        if state is not None:
+            for counts, saved in ((book_counts, state['books']), (member_counts, state['members'])):
+                for key, count in saved.items():
+                    counts[key] = counts.get(key, 0) + count
+            for month, saved in state['monthly'].items():
+                monthly = self.monthly_books.get(month)
+                if monthly is None:
+                    monthly = self.monthly_books[month] = TopCounter(self.top_size)
+                for key, count in saved.items():
+                    monthly.counts[key] = monthly.counts.get(key, 0) + count
+            for day, (borrows, returns) in state['daily'].items():
+                counts = self.daily.setdefault(int(day), [0, 0])
+                counts[0] += borrows
+                counts[1] += returns
+        for t_type, member_id, book_id, day in events:
+            counts = self.daily.get(day)
+            if counts is None:
+                counts = self.daily[day] = [0, 0]
+            if t_type == 'borrow':
+                counts[0] += 1
+                book_counts[book_id] = book_counts.get(book_id, 0) + 1
+                member_counts[member_id] = member_counts.get(member_id, 0) + 1
+                month = self.months.get(day) or self.month(day)
+                monthly = self.monthly_books.get(month)
+                if monthly is None:
+                    monthly = self.monthly_books[month] = TopCounter(self.top_size)
+                monthly.counts[book_id] = monthly.counts.get(book_id, 0) + 1
+            else:
+                counts[1] += 1
+        for counter in (self.book_borrows, self.member_borrows, *self.monthly_books.values()):
+            counter.rebuild()
+
+    def state(self):
+        # The raw counts as plain JSON-ready dicts
+        return {'books': self.book_borrows.counts, 'members': self.member_borrows.counts,
+                'monthly': {month: counter.counts for month, counter in self.monthly_books.items()},
+                'daily': {str(day): counts for day, counts in self.daily.items()}}
+
+    def most_borrowed_books(self, month=None, limit=10):
+        counter = self.book_borrows if month is None else self.monthly_books.get(month)
+        return counter.most_common(limit) if counter is not None else []
+
+    def most_active_members(self, limit=10):
+        return self.member_borrows.most_common(limit)
+
+    def daily_volume(self, start_day, end_day):
+        # [(day, borrows, returns)] for every day in the range, quiet days included
+        return [(day, *self.daily.get(day, (0, 0))) for day in range(start_day, end_day + 1)]
+
+# Changes staged for LibrarySystem.unit_of_work(); nothing is checked or
+# written until the unit commits
+class UnitOfWork:
+    def __init__(self):
+        # [(operation, args)] in the order they were staged
+        self.operations = []
+        # One per operation once committed: the fine for returns, else None
+        self.results = None
+
+    def __len__(self):
+        return len(self.operations)
+
+    def add_book(self, item_id, title, author, total_copies):
+        self.operations.append(('add_book', (item_id, title, author, total_copies)))
+
+    def add_member(self, member_id, name):
+        self.operations.append(('add_member', (member_id, name)))
+
+    def borrow_book(self, transaction_id, member_id, book_id, loan_days=LOAN_DAYS):
+        self.operations.append(('borrow', (transaction_id, member_id, book_id, loan_days)))
+
+    def return_book(self, transaction_id, member_id, book_id):
+        self.operations.append(('return', (transaction_id, member_id, book_id)))
 
+# Library System with file handling
+class LibrarySystem:
+    # Units of work kept for undo
+    UNDO_LIMIT = 100
+
+    def __init__(self, books_file='books.json', members_file='members.json', transactions_file='transactions.json',
+                 journal_file='library.journal', fsync_policy='always', snapshot_every=1000, storage=None, background=False):
+        if storage is None:
+            storage = JSONStorage(books_file, members_file, transactions_file, journal_file, fsync_policy, snapshot_every, background)
+        self.storage = storage
+        self.listeners = []
+        self.book_index = SearchIndex()
+        self.member_index = SearchIndex()
+        # Built from the history on first use, see the loans and stats properties
+        self._loans = None
+        self._stats = None
+        # member_id -> fines charged on late returns plus those accruing on
+        # overdue loans, as of the last accrual pass
+        self.fines = {}
+        self.fines_total = 0
+        # [(records, loan changes)] of committed units, newest last
+        self.undo_stack = []
+        self.redo_stack = []
+
+        self.load_data()
+
+    @timed('library.load_data')
+    def load_data(self):
+        self.storage.load()
+        self.books = self.storage.books
+        self.members = self.storage.members
+
+        self.book_index.build((book.item_id, book.title, book.author) for book in self.books.values())
+        self.member_index.build((member.member_id, member.name) for member in self.members.values())
+        self._loans = None
+        self._stats = None
+        self.undo_stack, self.redo_stack = [], []
+
+    # The transaction history may be loaded lazily by the storage backend
+    @property
+    def transactions(self):
+        return self.storage.transactions
+
+    @property
+    def loans(self):
+        if self._loans is None:
+            loans = LoanIndex(self.storage.archived_fines())
+            loans.build(self.transactions.loan_events())
+            self._loans = loans
+        return self._loans
+
+    @property
+    def stats(self):
+        if self._stats is None:
+            # Archived transactions count through the totals the archive keeps
+            stats = CirculationStats()
+            stats.build(self.transactions.circulation_events(), self.storage.archived_stats())
+            self._stats = stats
+        return self._stats
+
+    def _record_stats(self, t_type, member_id, book_id, date):
+        # Only once built; building later reads these records from the history
+        if self._stats is not None:
+            self._stats.record(t_type, member_id, book_id, date_to_timestamp(date) // SECONDS_PER_DAY)
+
+    @timed('library.save_data')
     def save_data(self):
-        # Save books
-        books_data = []
-        for book in self.books.values():
-            books_data.append({
-                'item_id': book.item_id,
-                'title': book.title,
-                'author': book.author,
-                'total_copies': book.total_copies,
-                'available_copies': book.available_copies
-            })
-        with open(self.books_file, 'w') as f:
-            json.dump(books_data, f, indent=4)
-
-        # Save members
-        members_data = []
-        for member in self.members.values():
-            members_data.append({
-                'member_id': member.member_id,
-                'name': member.name
-            })
-        with open(self.members_file, 'w') as f:
-            json.dump(members_data, f, indent=4)
-
-        # Save transactions
-        transactions_data = []
-        for t in self.transactions:
-            t_type = 'borrow' if isinstance(t, BorrowTransaction) else 'return'
-            transactions_data.append({
-                'transaction_id': t.transaction_id,
-                'member_id': t.member_id,
-                'book_id': t.book_id,
-                'date': t.date,
-                'type': t_type
-            })
-        with open(self.transactions_file, 'w') as f:
-            json.dump(transactions_data, f, indent=4)
+        self.storage.save()
+
+    # Blocks until every queued write is on disk
+    def flush(self):
+        self.storage.flush()
 
+    def pending_writes(self):
+        return self.storage.pending_writes()
+
+    def history_loaded(self):
+        return self.storage.history_loaded()
+
+    def close(self):
+        self.storage.close()
+
+    # Change events: listener(table, action, key) with action 'inserted',
+    # 'updated' or 'reloaded' (after a bulk operation, key is None); books and
+    # members are keyed by ID, transactions by position
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def _notify(self, table, action, key):
+        for listener in self.listeners:
+            listener(table, action, key)
+
+    @timed('library.add_book')
     def add_book(self, item_id, title, author, total_copies):
-        if item_id in self.books:
-            raise ValueError("Book ID already exists.")
-        self.books[item_id] = Book(item_id, title, author, total_copies)
-        self.save_data()
+        work = UnitOfWork()
+        work.add_book(item_id, title, author, total_copies)
+        self.commit_work(work)
 
+    @timed('library.add_member')
     def add_member(self, member_id, name):
-        if member_id in self.members:
-            raise ValueError("Member ID already exists.")
-        self.members[member_id] = Member(member_id, name)
-        self.save_data()
-
-    def borrow_book(self, transaction_id, member_id, book_id):
-        if member_id not in self.members:
-            raise ValueError("Member not found.")
-        if book_id not in self.books:
-            raise ValueError("Book not found.")
-        book = self.books[book_id]
-        if book.available_copies <= 0:
-            raise ValueError("No copies available to borrow.")
-        book.available_copies -= 1
-        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        transaction = BorrowTransaction(transaction_id, member_id, book_id, date)
-        self.transactions.append(transaction)
-        self.save_data()
+        work = UnitOfWork()
+        work.add_member(member_id, name)
+        self.commit_work(work)
 
+    @timed('library.borrow_book')
+    def borrow_book(self, transaction_id, member_id, book_id, loan_days=LOAN_DAYS):
+        work = UnitOfWork()
+        work.borrow_book(transaction_id, member_id, book_id, loan_days)
+        self.commit_work(work)
+
+    @timed('library.return_book')
     def return_book(self, transaction_id, member_id, book_id):
-        if member_id not in self.members:
-            raise ValueError("Member not found.")
-        if book_id not in self.books:
-            raise ValueError("Book not found.")
-        book = self.books[book_id]
-        book.available_copies += 1
-        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        transaction = ReturnTransaction(transaction_id, member_id, book_id, date)
-        self.transactions.append(transaction)
-        self.save_data()
+        # Returns the fine owed if the loan was overdue, otherwise 0
+        work = UnitOfWork()
+        work.return_book(transaction_id, member_id, book_id)
+        return self.commit_work(work)[0]
+
+    # Units of work: several changes checked together and committed with one
+    # storage write, or not at all. Every committed unit can be undone.
+    @contextmanager
+    def unit_of_work(self):
+        # with library.unit_of_work() as work:
+        #     work.borrow_book(...); work.borrow_book(...)
+        # commits when the block ends, and drops the changes if it raises
+        work = UnitOfWork()
+        yield work
+        self.commit_work(work)
+
+    @timed('library.commit_work')
+    def commit_work(self, work):
+        records, loan_changes, results = self._plan(work.operations)
+        if records:
+            if loan_changes:
+                # Built from the history before these records join it, so
+                # _apply_work doesn't open their loans a second time
+                self.loans
+            self.storage.commit_batch(records)
+            self._apply_work(records, loan_changes)
+            self.undo_stack.append((records, loan_changes))
+            del self.undo_stack[:-self.UNDO_LIMIT]
+            self.redo_stack = []
+        work.results = results
+        return results
+
+    def _plan(self, operations):
+        # Checks each operation against the state left by the ones before it
+        # and returns (journal records, loan changes, results); nothing changes
+        records, loan_changes, results = [], [], []
+        added_books, added_members, staged_ids = {}, set(), set()
+        available = {}
+        # Loans opened and closed by earlier operations of this unit
+        opened, closed = {}, set()
+        now = datetime.now()
+        date = now.strftime("%Y-%m-%d %H:%M:%S")
+
+        def check_member(member_id):
+            if member_id not in added_members and member_id not in self.members:
+                raise ValueError("Member not found.")
+
+        def check_book(book_id):
+            if book_id not in available:
+                if book_id in added_books:
+                    available[book_id] = added_books[book_id]
+                elif book_id in self.books:
+                    available[book_id] = self.books[book_id].available_copies
+                else:
+                    raise ValueError("Book not found.")
+
+        def check_transaction_id(transaction_id):
+            if transaction_id in staged_ids or self.storage.transaction_exists(transaction_id):
+                raise ValueError("Transaction ID already exists.")
+
+        def find_loan(member_id, book_id):
+            loans = self.loans
+            for loan_id, loan_book_id in loans.by_member.get(member_id, {}).items():
+                if loan_book_id == book_id and loan_id not in closed:
+                    return loan_id, loans.by_id[loan_id][2]
+            for loan_id, (loan_member_id, loan_book_id, due) in opened.items():
+                if loan_member_id == member_id and loan_book_id == book_id and loan_id not in closed:
+                    return loan_id, due
+            raise ValueError("This member has no outstanding loan of this book.")
+
+        for number, (op, args) in enumerate(operations, 1):
+            try:
+                result = None
+                if op == 'add_book':
+                    item_id, title, author, total_copies = args
+                    if item_id in added_books or item_id in self.books:
+                        raise ValueError("Book ID already exists.")
+                    added_books[item_id] = total_copies
+                    record = {'op': op, 'item_id': item_id, 'title': title, 'author': author, 'total_copies': total_copies}
+                elif op == 'add_member':
+                    member_id, name = args
+                    if member_id in added_members or member_id in self.members:
+                        raise ValueError("Member ID already exists.")
+                    added_members.add(member_id)
+                    record = {'op': op, 'member_id': member_id, 'name': name}
+                elif op == 'borrow':
+                    transaction_id, member_id, book_id, loan_days = args
+                    if loan_days <= 0:
+                        raise ValueError("Loan period must be at least one day.")
+                    check_member(member_id)
+                    check_book(book_id)
+                    if available[book_id] <= 0:
+                        raise ValueError("No copies available to borrow.")
+                    check_transaction_id(transaction_id)
+                    due_date = (now + timedelta(days=loan_days)).strftime("%Y-%m-%d %H:%M:%S")
+                    due = date_to_timestamp(due_date)
+                    available[book_id] -= 1
+                    opened[transaction_id] = (member_id, book_id, due)
+                    loan_changes.append(('borrow', transaction_id, member_id, book_id, due))
+                    record = {'op': op, 'transaction_id': transaction_id, 'member_id': member_id, 'book_id': book_id,
+                              'date': date, 'due_date': due_date}
+                else:
+                    transaction_id, member_id, book_id = args
+                    check_member(member_id)
+                    check_book(book_id)
+                    check_transaction_id(transaction_id)
+                    loan_id, due = find_loan(member_id, book_id)
+                    available[book_id] += 1
+                    closed.add(loan_id)
+                    result = overdue_fine(due, date_to_timestamp(date))
+                    loan_changes.append(('close', loan_id, member_id, book_id, due, result))
+                    record = {'op': op, 'transaction_id': transaction_id, 'member_id': member_id, 'book_id': book_id, 'date': date,
+                              'fine': result}
+            except ValueError as e:
+                if len(operations) > 1:
+                    raise ValueError(f"Change {number}: {e}") from None
+                raise
+            if op in ('borrow', 'return'):
+                staged_ids.add(transaction_id)
+            records.append(record)
+            results.append(result)
+        return records, loan_changes, results
+
+    def _apply_work(self, records, loan_changes):
+        # The in-memory effects of committed records besides the storage's own
+        for change, *loan in loan_changes:
+            if change == 'borrow':
+                self.loans.borrow(*loan)
+            else:
+                loan_id, member_id, book_id, _, fine = loan
+                self.loans.close(loan_id, member_id, book_id, fine)
+        position = None
+        for record in records:
+            op = record['op']
+            if op == 'add_book':
+                self.book_index.add(record['item_id'], record['title'], record['author'])
+                self._notify('books', 'inserted', record['item_id'])
+            elif op == 'add_member':
+                self.member_index.add(record['member_id'], record['name'])
+                self._notify('members', 'inserted', record['member_id'])
+            else:
+                if position is None:
+                    position = len(self.transactions) - sum(1 for r in records if r['op'] in ('borrow', 'return'))
+                self._record_stats(op, record['member_id'], record['book_id'], record['date'])
+                self._notify('books', 'updated', record['book_id'])
+                self._notify('transactions', 'inserted', position)
+                position += 1
+
+    @staticmethod
+    def _tables(records):
+        tables = set()
+        for record in records:
+            if record['op'] == 'add_member':
+                tables.add('members')
+            else:
+                tables.add('books')
+                if record['op'] != 'add_book':
+                    tables.add('transactions')
+        return tables
+
+    @timed('library.undo')
+    def undo(self):
+        # Reverts the newest unit of work with one storage write and returns
+        # how many changes it held (0 when there is nothing to undo)
+        if not self.undo_stack:
+            return 0
+        records, loan_changes = self.undo_stack[-1]
+        transaction_ids = [record['transaction_id'] for record in records if record['op'] in ('borrow', 'return')]
+        if transaction_ids:
+            history = self.transactions
+            tail = history[len(history) - len(transaction_ids):]
+            if [t.transaction_id for t in tail] != transaction_ids:
+                self.undo_stack, self.redo_stack = [], []
+                raise ValueError("The history has changed since then; this change can no longer be undone.")
+        inverse = []
+        for record in reversed(records):
+            op = record['op']
+            if op == 'add_book':
+                inverse.append({'op': 'remove_book', 'item_id': record['item_id']})
+            elif op == 'add_member':
+                inverse.append({'op': 'remove_member', 'member_id': record['member_id']})
+            else:
+                inverse.append({'op': 'void', 'transaction_id': record['transaction_id'], 'type': op, 'book_id': record['book_id']})
+        if loan_changes:
+            self.loans
+        self.storage.commit_batch(inverse)
+        self.undo_stack.pop()
+        for change, *loan in reversed(loan_changes):
+            if change == 'borrow':
+                self.loans.close(*loan[:3])
+            else:
+                self.loans.borrow(*loan[:4])
+                self.loans.charge(loan[1], -loan[4])
+        for record in records:
+            if record['op'] == 'add_book':
+                self.book_index.remove(record['item_id'])
+            elif record['op'] == 'add_member':
+                self.member_index.remove(record['member_id'])
+        if transaction_ids:
+            # The counters only grow; they are rebuilt from the history on next use
+            self._stats = None
+        self.redo_stack.append((records, loan_changes))
+        for table in self._tables(records):
+            self._notify(table, 'reloaded', None)
+        return len(records)
+
+    @timed('library.redo')
+    def redo(self):
+        # Re-applies the newest undone unit as it was first committed
+        if not self.redo_stack:
+            return 0
+        records, loan_changes = self.redo_stack[-1]
+        if loan_changes:
+            self.loans
+        self.storage.commit_batch(records)
+        self.redo_stack.pop()
+        self._apply_work(records, loan_changes)
+        self.undo_stack.append((records, loan_changes))
+        return len(records)
+
+    # Bulk operations: rows are validated one by one, the valid ones are
+    # persisted as a single batch, and [(row_number, error)] is returned
+    @staticmethod
+    def _field(row, name):
+        if row is None:
+            raise ValueError("Invalid JSON.")
+        if not isinstance(row, dict):
+            raise ValueError("Row must be a JSON object.")
+        value = str(row.get(name) or '').strip()
+        if not value:
+            raise ValueError(f"Missing {name}.")
+        return value
+
+    def add_books_bulk(self, rows, first_row=1):
+        errors, records, batch_ids = [], [], set()
+        for row_number, row in enumerate(rows, first_row):
+            try:
+                item_id = self._field(row, 'item_id')
+                title = self._field(row, 'title')
+                author = self._field(row, 'author')
+                try:
+                    total_copies = int(self._field(row, 'total_copies'))
+                except ValueError:
+                    total_copies = 0
+                if total_copies <= 0:
+                    raise ValueError("Total copies must be a positive integer.")
+                if item_id in batch_ids or item_id in self.books:
+                    raise ValueError("Book ID already exists.")
+            except ValueError as e:
+                errors.append((row_number, str(e)))
+                continue
+            batch_ids.add(item_id)
+            records.append({'op': 'add_book', 'item_id': item_id, 'title': title, 'author': author, 'total_copies': total_copies})
+        if records:
+            self.storage.commit_batch(records)
+            self.undo_stack, self.redo_stack = [], []
+            self.book_index.build((r['item_id'], r['title'], r['author']) for r in records)
+            self._notify('books', 'reloaded', None)
+        return errors
+
+    def add_members_bulk(self, rows, first_row=1):
+        errors, records, batch_ids = [], [], set()
+        for row_number, row in enumerate(rows, first_row):
+            try:
+                member_id = self._field(row, 'member_id')
+                name = self._field(row, 'name')
+                if member_id in batch_ids or member_id in self.members:
+                    raise ValueError("Member ID already exists.")
+            except ValueError as e:
+                errors.append((row_number, str(e)))
+                continue
+            batch_ids.add(member_id)
+            records.append({'op': 'add_member', 'member_id': member_id, 'name': name})
+        if records:
+            self.storage.commit_batch(records)
+            self.undo_stack, self.redo_stack = [], []
+            self.member_index.build((r['member_id'], r['name']) for r in records)
+            self._notify('members', 'reloaded', None)
+        return errors
+
+    def apply_transactions_bulk(self, rows, first_row=1):
+        # Rows are checked in order against the state left by earlier rows
+        errors, records, batch_ids = [], [], set()
+        available = {}
+        # Borrow dates of the loans this batch opens
+        borrow_dates = {}
+        loans = self.loans
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for row_number, row in enumerate(rows, first_row):
+            try:
+                t_type = self._field(row, 'type').lower()
+                if t_type not in ('borrow', 'return'):
+                    raise ValueError("Type must be borrow or return.")
+                transaction_id = self._field(row, 'transaction_id')
+                member_id = self._field(row, 'member_id')
+                book_id = self._field(row, 'book_id')
+                date = str(row.get('date') or '').strip() or now
+                due_date = str(row.get('due_date') or '').strip()
+                try:
+                    date = datetime.fromisoformat(date).strftime("%Y-%m-%d %H:%M:%S")
+                    if due_date:
+                        due_date = datetime.fromisoformat(due_date).strftime("%Y-%m-%d %H:%M:%S")
+                except ValueError:
+                    raise ValueError("Invalid date.")
+                if member_id not in self.members:
+                    raise ValueError("Member not found.")
+                if book_id not in available:
+                    if book_id not in self.books:
+                        raise ValueError("Book not found.")
+                    available[book_id] = self.books[book_id].available_copies
+                if transaction_id in batch_ids or self.storage.transaction_exists(transaction_id):
+                    raise ValueError("Transaction ID already exists.")
+                if t_type == 'borrow':
+                    if available[book_id] <= 0:
+                        raise ValueError("No copies available to borrow.")
+                    due_date = due_date or due_after(date)
+                    if due_date <= date:
+                        raise ValueError("Due date must be after the borrow date.")
+                    loans.borrow(transaction_id, member_id, book_id, date_to_timestamp(due_date))
+                    borrow_dates[transaction_id] = date
+                    available[book_id] -= 1
+                else:
+                    open_loans = [loan_id for loan_id, loan_book_id in loans.by_member.get(member_id, {}).items()
+                                  if loan_book_id == book_id]
+                    if not open_loans:
+                        raise ValueError("This member has no outstanding loan of this book.")
+                    # The oldest of them borrowed on or before the return date
+                    loan_id = next((loan_id for loan_id in open_loans
+                                    if (borrow_dates.get(loan_id) or self.storage.get_transaction(loan_id).date) <= date), None)
+                    if loan_id is None:
+                        raise ValueError("Return date is before the borrow date.")
+                    fine = overdue_fine(loans.by_id[loan_id][2], date_to_timestamp(date))
+                    loans.close(loan_id, member_id, book_id, fine)
+                    available[book_id] += 1
+            except ValueError as e:
+                errors.append((row_number, str(e)))
+                continue
+            batch_ids.add(transaction_id)
+            record = {'op': t_type, 'transaction_id': transaction_id, 'member_id': member_id, 'book_id': book_id, 'date': date}
+            if t_type == 'borrow':
+                record['due_date'] = due_date
+            else:
+                record['fine'] = fine
+            records.append(record)
+        if records:
+            try:
+                self.storage.commit_batch(records)
+            except Exception:
+                # The loan index already holds this batch; rebuild it from storage
+                self._loans = None
+                raise
+            # Bulk changes are not undoable, and the units before them no longer can be
+            self.undo_stack, self.redo_stack = [], []
+            for record in records:
+                self._record_stats(record['op'], record['member_id'], record['book_id'], record['date'])
+            self._notify('books', 'reloaded', None)
+            self._notify('transactions', 'reloaded', None)
+        return errors
+
+    @timed('library.import_file')
+    def import_file(self, path, kind, batch_size=10000):
+        # Streams a .csv (with a header row) or .jsonl file into the bulk API,
+        # one batch at a time; row numbers in the errors count data rows from 1
+        bulk = {'books': self.add_books_bulk, 'members': self.add_members_bulk,
+                'transactions': self.apply_transactions_bulk}[kind]
+        errors = []
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            if path.lower().endswith('.csv'):
+                rows = csv.DictReader(f)
+            else:
+                rows = (self._parse_jsonl(line) for line in f if line.strip())
+            first_row = 1
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    break
+                errors.extend(bulk(batch, first_row))
+                first_row += len(batch)
+        return errors
+
+    @staticmethod
+    def _parse_jsonl(line):
+        # None marks a line that isn't JSON; _field reports it for the row
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def get_transaction(self, transaction_id):
+        return self.storage.get_transaction(transaction_id)
+
+    def current_loans(self, member_id):
+        return [self.get_transaction(loan_id) for loan_id in self.loans.by_member.get(member_id, {})]
+
+    def current_borrowers(self, book_id):
+        return list(self.loans.by_book.get(book_id, {}).values())
+
+    def member_history(self, member_id):
+        return self.storage.transactions_for_member(member_id)
+
+    def book_history(self, book_id):
+        return self.storage.transactions_for_book(book_id)
+
+    def transactions_between(self, start_date, end_date):
+        return self.storage.transactions_between(*self._date_bounds(start_date, end_date))
+
+    def books_page(self, start, stop):
+        return self.storage.books_page(start, stop)
+
+    @staticmethod
+    def _date_bounds(start_date, end_date):
+        # Date-only bounds cover the whole day
+        if start_date is not None and len(start_date) == 10:
+            start_date += " 00:00:00"
+        if end_date is not None and len(end_date) == 10:
+            end_date += " 23:59:59"
+        for date in (start_date, end_date):
+            if date is not None:
+                try:
+                    datetime.fromisoformat(date)
+                except ValueError:
+                    raise ValueError(f"Invalid date: {date}")
+        return start_date, end_date
+
+    @timed('library.archive')
+    def archive_before(self, cutoff_date):
+        # Moves transactions before cutoff_date out of memory into the archive;
+        # borrows still on loan stay in the hot window. Returns the count moved.
+        cutoff_date = self._date_bounds(cutoff_date, None)[0]
+        open_loans = {loan_id for loans in self.loans.by_member.values() for loan_id in loans}
+        moved = self.storage.archive(cutoff_date, open_loans)
+        if moved:
+            self.undo_stack, self.redo_stack = [], []
+            self._notify('transactions', 'reloaded', None)
+        return moved
+
+    def iter_transactions(self, start_date=None, end_date=None):
+        # Streams archived and hot transactions as dicts without loading the
+        # archive into memory
+        return self.storage.iter_history(*self._date_bounds(start_date, end_date))
+
+    EXPORT_FIELDS = ('transaction_id', 'type', 'member_id', 'book_id', 'date', 'due_date', 'fine')
+
+    @timed('library.export')
+    def export_transactions(self, path, start_date=None, end_date=None):
+        # Writes a .csv (with a header row) or .jsonl file that import_file
+        # reads back; returns the number of transactions written
+        count = 0
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            records = self.iter_transactions(start_date, end_date)
+            if path.lower().endswith('.csv'):
+                writer = csv.DictWriter(f, self.EXPORT_FIELDS, extrasaction='ignore')
+                writer.writeheader()
+                for record in records:
+                    writer.writerow(record)
+                    count += 1
+            else:
+                for record in records:
+                    f.write(json.dumps({field: record[field] for field in self.EXPORT_FIELDS if field in record}) + '\n')
+                    count += 1
+        return count
+
+    # Reports, answered from the circulation aggregates
+    def most_borrowed_books(self, month=None, limit=10):
+        # month as 'YYYY-MM', or None for all time; [(book_id, borrows)]
+        return self.stats.most_borrowed_books(month, limit)
+
+    def most_active_members(self, limit=10):
+        return self.stats.most_active_members(limit)
+
+    # Due dates and fines, from the open loans ordered by due date
+    def overdue_loans(self, now=None):
+        # [(transaction_id, member_id, book_id, due_date, fine)], most overdue first
+        now = date_to_timestamp(now or datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        loans = self.loans
+        rows = []
+        for due, loan_id in loans.overdue(now):
+            member_id, book_id, _ = loans.by_id[loan_id]
+            rows.append((loan_id, member_id, book_id, timestamp_to_date(due), overdue_fine(due, now)))
+        return rows
+
+    def iter_fine_accrual(self, now=None, chunk_size=5000):
+        # Recomputes self.fines as the fines charged on returns plus what the
+        # overdue loans have accrued, a chunk at a time, yielding between
+        # chunks so a UI can spread the pass over several event-loop
+        # callbacks. Loans returned meanwhile are skipped.
+        now = date_to_timestamp(now or datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        loans = self._loans
+        if loans is None:
+            # Built a chunk at a time too, from the history as it is now. If
+            # a change meanwhile built the index, that one is used; if the
+            # history was replaced, this pass is dropped.
+            history = self.transactions
+            count = len(history)
+            loans = LoanIndex(self.storage.archived_fines())
+            yield from loans.iter_build(itertools.islice(history.loan_events(), count), chunk_size)
+            if self._loans is not None:
+                loans = self._loans
+            elif history is self.transactions and len(history) == count:
+                self._loans = loans
+            else:
+                return
+        overdue = loans.overdue(now)
+        fines = dict(loans.charged)
+        for start in range(0, len(overdue), chunk_size):
+            for due, loan_id in overdue[start:start + chunk_size]:
+                loan = loans.by_id.get(loan_id)
+                if loan is not None:
+                    fines[loan[0]] = fines.get(loan[0], 0) + overdue_fine(due, now)
+            yield
+        self.fines = fines
+        self.fines_total = sum(fines.values())
+
+    @timed('library.accrue_fines')
+    def accrue_fines(self, now=None):
+        for _ in self.iter_fine_accrual(now):
+            pass
+        return self.fines
+
+    def members_with_most_loans(self, limit=10):
+        # [(member_id, open loans)]; proportional to the members with a loan out
+        return heapq.nlargest(limit, ((member_id, len(loans)) for member_id, loans in self.loans.by_member.items()),
+                              key=lambda item: item[1])
+
+    def daily_volume(self, start_date, end_date):
+        # [('YYYY-MM-DD', borrows, returns)] for each day from start to end
+        start = date_to_timestamp(start_date[:10]) // SECONDS_PER_DAY
+        end = date_to_timestamp(end_date[:10]) // SECONDS_PER_DAY
+        return [((EPOCH + timedelta(days=day)).strftime("%Y-%m-%d"), borrows, returns)
+                for day, borrows, returns in self.stats.daily_volume(start, end)]
+
+    def transactions_page(self, start, stop):
+        return self.transactions[start:stop]
+
+    @timed('library.search_books')
+    def search_books(self, query, limit=50):
+        return [self.books[item_id] for item_id in self.book_index.search(query, limit)]
+
+    @timed('library.search_members')
+    def search_members(self, query, limit=50):
+        return [self.members[member_id] for member_id in self.member_index.search(query, limit)]
+
+# Treeview that only materializes the rows currently in view
+class VirtualTreeview(ttk.Frame):
+    def __init__(self, master, columns, row_count, fetch_rows, buffer=50):
+        super().__init__(master)
+        # row_count() -> int, fetch_rows(start, stop) -> list of (iid, values)
+        self.row_count = row_count
+        self.fetch_rows = fetch_rows
+        self.buffer = buffer
+        self.offset = 0
+        self.visible = 20
+        # Rows fetched around the window, so small scrolls don't refetch
+        self.cache_start = 0
+        self.cache = []
+
+        self.tree = ttk.Treeview(self, columns=columns, show='headings')
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, anchor='center')
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.on_scroll)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+
+        self.tree.bind('<Configure>', self.on_resize)
+        self.tree.bind('<MouseWheel>', lambda e: self.scroll_to(self.offset - (e.delta // 120) * 3))
+        self.tree.bind('<Button-4>', lambda e: self.scroll_to(self.offset - 3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll_to(self.offset + 3))
+
+    def on_resize(self, event):
+        row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        visible = max(1, event.height // row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll_to(int(float(amount) * self.row_count()))
+        elif unit == 'pages':
+            self.scroll_to(self.offset + int(amount) * self.visible)
+        else:
+            self.scroll_to(self.offset + int(amount))
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, self.row_count() - self.visible))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def refresh(self):
+        self.cache = []
+        self.render()
+
+    @timed('ui.render_window')
+    def render(self):
+        total = self.row_count()
+        self.offset = max(0, min(self.offset, total - self.visible))
+        stop = min(total, self.offset + self.visible)
+        cache_stop = self.cache_start + len(self.cache)
+        if self.offset < self.cache_start or stop > cache_stop:
+            self.cache_start = max(0, self.offset - self.buffer)
+            self.cache = self.fetch_rows(self.cache_start, stop + self.buffer)
+
+        self.tree.delete(*self.tree.get_children())
+        for iid, values in self.cache[self.offset - self.cache_start:stop - self.cache_start]:
+            self.tree.insert('', tk.END, iid=iid, values=values)
+        if total:
+            self.scrollbar.set(self.offset / total, stop / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def row_inserted(self, index):
+        if index < self.cache_start + len(self.cache) + self.buffer:
+            self.cache = []
+        # Follow the tail if the previous last row was in view
+        if self.offset + self.visible >= index:
+            self.offset += 1
+        self.render()
+
+    def row_updated(self, iid, values):
+        for i, (cached_iid, _) in enumerate(self.cache):
+            if cached_iid == iid:
+                self.cache[i] = (iid, values)
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=values)
 
 # GUI Application
 class LibraryApp:
-    def __init__(self, root):
+    def __init__(self, root, library=None, virtual_lists=True):
         self.root = root
         self.root.title("Library Management System")
-        self.library = LibrarySystem()
+        self.library = library if library is not None else LibrarySystem()
+        # Windowed Treeviews for the potentially huge book and transaction lists
+        self.virtual_lists = virtual_lists
+        # Search results currently shown, or None for the full lists
+        self.book_results = None
+        self.member_results = None
+        # The transaction list is filled when its tab is first shown
+        self.transactions_shown = False
 
         self.create_widgets()
+        self.library.subscribe(self.on_library_change)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.update_status()
+        # The first pass waits one interval, and passes are skipped until the
+        # history has been loaded for something else, so the timer never
+        # loads it on the Tk thread by itself
+        self.fine_pass = None
+        self.root.after(self.FINE_INTERVAL_MS, self.start_fine_accrual)
+
+    def on_close(self):
+        self.status_label.config(text="Saving...")
+        self.root.update_idletasks()
+        try:
+            self.library.close()
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not save all changes: {e}")
+        self.root.destroy()
+
+    def update_status(self):
+        pending = self.library.pending_writes()
+        text = f"Saving... {pending} pending write(s)" if pending else "All changes saved"
+        if self.library.fines:
+            text += f"   |   Fines: {self.library.fines_total} owed by {len(self.library.fines)} member(s)"
+        self.status_label.config(text=text)
+        self.root.after(250, self.update_status)
+
+    # Fine accrual runs on the Tk event loop every FINE_INTERVAL_MS, one chunk
+    # of overdue loans per callback, so the window never freezes for it
+    FINE_INTERVAL_MS = 60 * 1000
+
+    def start_fine_accrual(self):
+        if not self.library.history_loaded():
+            self.root.after(self.FINE_INTERVAL_MS, self.start_fine_accrual)
+            return
+        self.fine_pass = self.library.iter_fine_accrual()
+        self.step_fine_accrual()
+
+    def step_fine_accrual(self):
+        try:
+            next(self.fine_pass)
+        except StopIteration:
+            self.fine_pass = None
+            self.root.after(self.FINE_INTERVAL_MS, self.start_fine_accrual)
+            return
+        self.root.after(1, self.step_fine_accrual)
 
     def create_widgets(self):
         tab_control = ttk.Notebook(self.root)
@@ -186,16 +2477,43 @@ class LibraryApp:
         self.tab_books = ttk.Frame(tab_control)
         self.tab_members = ttk.Frame(tab_control)
         self.tab_transactions = ttk.Frame(tab_control)
+        self.tab_reports = ttk.Frame(tab_control)
+        self.tab_diagnostics = ttk.Frame(tab_control)
 
         tab_control.add(self.tab_books, text='Books')
         tab_control.add(self.tab_members, text='Members')
         tab_control.add(self.tab_transactions, text='Transactions')
+        tab_control.add(self.tab_reports, text='Reports')
+        tab_control.add(self.tab_diagnostics, text='Diagnostics')
 
         tab_control.pack(expand=1, fill='both')
+        tab_control.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(fill='x', padx=10, pady=(0, 5))
+        ttk.Button(status_frame, text="Redo", command=self.redo).pack(side='right')
+        ttk.Button(status_frame, text="Undo", command=self.undo).pack(side='right', padx=5)
+        self.status_label = ttk.Label(status_frame, anchor='w')
+        self.status_label.pack(side='left', fill='x', expand=True)
+        self.root.bind('<Control-z>', lambda event: self.undo())
+        self.root.bind('<Control-y>', lambda event: self.redo())
 
         self.create_books_tab()
         self.create_members_tab()
         self.create_transactions_tab()
+        self.create_reports_tab()
+        self.create_diagnostics_tab()
+
+    def undo(self):
+        try:
+            if not self.library.undo():
+                messagebox.showinfo("Undo", "Nothing to undo.")
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+
+    def redo(self):
+        if not self.library.redo():
+            messagebox.showinfo("Redo", "Nothing to redo.")
 
     # Books tab
     def create_books_tab(self):
@@ -227,12 +2545,24 @@ class LibraryApp:
         list_frame = ttk.LabelFrame(frame, text="Books List")
         list_frame.pack(fill='both', expand=True, padx=10, pady=10)
 
+        search_frame = ttk.Frame(list_frame)
+        search_frame.pack(fill='x', pady=(0, 5))
+        ttk.Label(search_frame, text="Search:").pack(side='left')
+        self.book_search_var = tk.StringVar()
+        self.book_search_var.trace_add('write', lambda *args: self.search_books())
+        ttk.Entry(search_frame, textvariable=self.book_search_var).pack(side='left', fill='x', expand=True)
+
         columns = ('ID', 'Title', 'Author', 'Available/Total')
-        self.books_tree = ttk.Treeview(list_frame, columns=columns, show='headings')
-        for col in columns:
-            self.books_tree.heading(col, text=col)
-            self.books_tree.column(col, anchor='center')
-        self.books_tree.pack(fill='both', expand=True)
+        if self.virtual_lists:
+            self.books_view = VirtualTreeview(list_frame, columns, self.book_count, self.fetch_book_rows)
+            self.books_view.pack(fill='both', expand=True)
+            self.books_tree = self.books_view.tree
+        else:
+            self.books_tree = ttk.Treeview(list_frame, columns=columns, show='headings')
+            for col in columns:
+                self.books_tree.heading(col, text=col)
+                self.books_tree.column(col, anchor='center')
+            self.books_tree.pack(fill='both', expand=True)
 
         self.refresh_books_list()
 
@@ -260,15 +2590,35 @@ class LibraryApp:
             self.book_title_entry.delete(0, tk.END)
             self.book_author_entry.delete(0, tk.END)
             self.book_copies_entry.delete(0, tk.END)
-            self.refresh_books_list()
         except ValueError as e:
             messagebox.showerror("Error", str(e))
 
+    @staticmethod
+    def book_row(book):
+        return (book.item_id, book.title, book.author, f"{book.available_copies}/{book.total_copies}")
+
+    def search_books(self):
+        query = self.book_search_var.get().strip()
+        self.book_results = self.library.search_books(query, limit=1000) if query else None
+        self.refresh_books_list()
+
+    def book_count(self):
+        return len(self.book_results) if self.book_results is not None else len(self.library.books)
+
+    def fetch_book_rows(self, start, stop):
+        books = self.book_results[start:stop] if self.book_results is not None else self.library.books_page(start, stop)
+        return [(book.item_id, self.book_row(book)) for book in books]
+
+    @timed('ui.refresh_books_list')
     def refresh_books_list(self):
+        if self.virtual_lists:
+            self.books_view.refresh()
+            return
         for i in self.books_tree.get_children():
             self.books_tree.delete(i)
-        for book in self.library.books.values():
-            self.books_tree.insert('', tk.END, values=(book.item_id, book.title, book.author, f"{book.available_copies}/{book.total_copies}"))
+        books = self.book_results if self.book_results is not None else self.library.books.values()
+        for book in books:
+            self.books_tree.insert('', tk.END, iid=book.item_id, values=self.book_row(book))
 
     # Members tab
     def create_members_tab(self):
@@ -290,6 +2640,13 @@ class LibraryApp:
         list_frame = ttk.LabelFrame(frame, text="Members List")
         list_frame.pack(fill='both', expand=True, padx=10, pady=10)
 
+        search_frame = ttk.Frame(list_frame)
+        search_frame.pack(fill='x', pady=(0, 5))
+        ttk.Label(search_frame, text="Search:").pack(side='left')
+        self.member_search_var = tk.StringVar()
+        self.member_search_var.trace_add('write', lambda *args: self.search_members())
+        ttk.Entry(search_frame, textvariable=self.member_search_var).pack(side='left', fill='x', expand=True)
+
         columns = ('ID', 'Name')
         self.members_tree = ttk.Treeview(list_frame, columns=columns, show='headings')
         for col in columns:
@@ -312,15 +2669,21 @@ class LibraryApp:
             messagebox.showinfo("Success", "Member added successfully.")
             self.member_id_entry.delete(0, tk.END)
             self.member_name_entry.delete(0, tk.END)
-            self.refresh_members_list()
         except ValueError as e:
             messagebox.showerror("Error", str(e))
 
+    def search_members(self):
+        query = self.member_search_var.get().strip()
+        self.member_results = self.library.search_members(query, limit=1000) if query else None
+        self.refresh_members_list()
+
+    @timed('ui.refresh_members_list')
     def refresh_members_list(self):
         for i in self.members_tree.get_children():
             self.members_tree.delete(i)
-        for member in self.library.members.values():
-            self.members_tree.insert('', tk.END, values=(member.member_id, member.name))
+        members = self.member_results if self.member_results is not None else self.library.members.values()
+        for member in members:
+            self.members_tree.insert('', tk.END, iid=member.member_id, values=(member.member_id, member.name))
 
     # Transactions tab
     def create_transactions_tab(self):
@@ -337,7 +2700,7 @@ class LibraryApp:
         self.trans_member_entry = ttk.Entry(trans_frame)
         self.trans_member_entry.grid(row=1, column=1, sticky='w')
 
-        ttk.Label(trans_frame, text="Book ID:").grid(row=2, column=0, sticky='w')
+        ttk.Label(trans_frame, text="Book ID(s):").grid(row=2, column=0, sticky='w')
         self.trans_book_entry = ttk.Entry(trans_frame)
         self.trans_book_entry.grid(row=2, column=1, sticky='w')
 
@@ -347,63 +2710,283 @@ class LibraryApp:
         list_frame = ttk.LabelFrame(frame, text="Transactions List")
         list_frame.pack(fill='both', expand=True, padx=10, pady=10)
 
-        columns = ('Transaction ID', 'Type', 'Member ID', 'Book ID', 'Date')
-        self.trans_tree = ttk.Treeview(list_frame, columns=columns, show='headings')
-        for col in columns:
-            self.trans_tree.heading(col, text=col)
-            self.trans_tree.column(col, anchor='center')
-        self.trans_tree.pack(fill='both', expand=True)
-
-        self.refresh_transactions_list()
-
-    def borrow_book(self):
+        columns = ('Transaction ID', 'Type', 'Member ID', 'Book ID', 'Date', 'Due Date')
+        if self.virtual_lists:
+            self.trans_view = VirtualTreeview(list_frame, columns, lambda: len(self.library.transactions), self.fetch_transaction_rows)
+            self.trans_view.pack(fill='both', expand=True)
+            self.trans_tree = self.trans_view.tree
+        else:
+            self.trans_tree = ttk.Treeview(list_frame, columns=columns, show='headings')
+            for col in columns:
+                self.trans_tree.heading(col, text=col)
+                self.trans_tree.column(col, anchor='center')
+            self.trans_tree.pack(fill='both', expand=True)
+
+    def on_tab_changed(self, event):
+        selected = event.widget.select()
+        if selected == str(self.tab_transactions) and not self.transactions_shown:
+            self.transactions_shown = True
+            self.refresh_transactions_list()
+        elif selected == str(self.tab_reports):
+            self.run_report()
+        elif selected == str(self.tab_diagnostics):
+            self.refresh_diagnostics()
+
+    def circulate(self, action):
+        # Several book IDs (separated by commas or spaces) are checked in or
+        # out together as one unit, with transaction IDs <ID>-1, <ID>-2, ...
         trans_id = self.trans_id_entry.get().strip()
         member_id = self.trans_member_entry.get().strip()
-        book_id = self.trans_book_entry.get().strip()
+        book_ids = re.split(r'[\s,]+', self.trans_book_entry.get().strip())
 
-        if not trans_id or not member_id or not book_id:
+        if not trans_id or not member_id or not book_ids[0]:
             messagebox.showerror("Error", "All fields are required.")
             return
 
         try:
-            self.library.borrow_book(trans_id, member_id, book_id)
-            messagebox.showinfo("Success", "Book borrowed successfully.")
+            with self.library.unit_of_work() as work:
+                stage = work.borrow_book if action == 'borrow' else work.return_book
+                if len(book_ids) == 1:
+                    stage(trans_id, member_id, book_ids[0])
+                else:
+                    for i, book_id in enumerate(book_ids, 1):
+                        stage(f"{trans_id}-{i}", member_id, book_id)
+            books = "Book" if len(book_ids) == 1 else f"{len(book_ids)} books"
+            fine = sum(work.results) if action == 'return' else 0
+            verb = "borrowed" if action == 'borrow' else "returned"
+            messagebox.showinfo("Success", f"{books} returned late. Fine due: {fine}." if fine else f"{books} {verb} successfully.")
             self.trans_id_entry.delete(0, tk.END)
             self.trans_member_entry.delete(0, tk.END)
             self.trans_book_entry.delete(0, tk.END)
-            self.refresh_books_list()
-            self.refresh_transactions_list()
         except ValueError as e:
             messagebox.showerror("Error", str(e))
 
+    def borrow_book(self):
+        self.circulate('borrow')
+
     def return_book(self):
-        trans_id = self.trans_id_entry.get().strip()
-        member_id = self.trans_member_entry.get().strip()
-        book_id = self.trans_book_entry.get().strip()
+        self.circulate('return')
 
-        if not trans_id or not member_id or not book_id:
-            messagebox.showerror("Error", "All fields are required.")
-            return
+    @staticmethod
+    def transaction_row(t):
+        if isinstance(t, BorrowTransaction):
+            return (t.transaction_id, 'Borrow', t.member_id, t.book_id, t.date, t.due_date)
+        return (t.transaction_id, 'Return', t.member_id, t.book_id, t.date, '')
 
-        try:
-            self.library.return_book(trans_id, member_id, book_id)
-            messagebox.showinfo("Success", "Book returned successfully.")
-            self.trans_id_entry.delete(0, tk.END)
-            self.trans_member_entry.delete(0, tk.END)
-            self.trans_book_entry.delete(0, tk.END)
-            self.refresh_books_list()
-            self.refresh_transactions_list()
-        except ValueError as e:
-            messagebox.showerror("Error", str(e))
+    def fetch_transaction_rows(self, start, stop):
+        return [(str(index), self.transaction_row(t)) for index, t in enumerate(self.library.transactions_page(start, stop), start)]
 
+    @timed('ui.refresh_transactions_list')
     def refresh_transactions_list(self):
+        if self.virtual_lists:
+            self.trans_view.refresh()
+            return
         for i in self.trans_tree.get_children():
             self.trans_tree.delete(i)
-        for t in self.library.transactions:
-            t_type = 'Borrow' if isinstance(t, BorrowTransaction) else 'Return'
-            self.trans_tree.insert('', tk.END, values=(t.transaction_id, t_type, t.member_id, t.book_id, t.date))
+        for index, t in enumerate(self.library.transactions):
+            self.trans_tree.insert('', tk.END, iid=str(index), values=self.transaction_row(t))
+
+    # Reports tab: rankings and volumes from the circulation aggregates
+    REPORTS = ('Most borrowed books', 'Most active members', 'Most current loans', 'Daily volume', 'Overdue loans')
+
+    def create_reports_tab(self):
+        frame = self.tab_reports
+
+        controls = ttk.Frame(frame)
+        controls.pack(fill='x', padx=10, pady=10)
+        ttk.Label(controls, text="Report:").pack(side='left')
+        self.report_var = tk.StringVar(value=self.REPORTS[0])
+        ttk.Combobox(controls, textvariable=self.report_var, values=self.REPORTS, state='readonly',
+                     width=22).pack(side='left', padx=5)
+        ttk.Label(controls, text="Month (YYYY-MM, optional):").pack(side='left')
+        self.report_month_entry = ttk.Entry(controls, width=10)
+        self.report_month_entry.insert(0, datetime.now().strftime("%Y-%m"))
+        self.report_month_entry.pack(side='left', padx=5)
+        ttk.Button(controls, text="Run", command=self.run_report).pack(side='left')
+
+        self.report_tree = ttk.Treeview(frame, columns=('c1', 'c2', 'c3', 'c4'), show='headings')
+        for col in ('c1', 'c2', 'c3', 'c4'):
+            self.report_tree.column(col, anchor='center')
+        self.report_tree.pack(fill='both', expand=True, padx=10, pady=(0, 10))
+
+    def run_report(self):
+        report = self.report_var.get()
+        month = self.report_month_entry.get().strip()
+        if month and not re.fullmatch(r'\d{4}-(0[1-9]|1[0-2])', month):
+            messagebox.showerror("Error", "Month must look like 2024-05, or be left blank.")
+            return
+        limit = 100
+        if report == 'Most borrowed books':
+            headings = ('Rank', 'Book ID', 'Title', 'Borrows')
+            rows = [(rank, book_id, self.library.books[book_id].title if book_id in self.library.books else '', count)
+                    for rank, (book_id, count) in enumerate(self.library.most_borrowed_books(month or None, limit), 1)]
+        elif report in ('Most active members', 'Most current loans'):
+            active = report == 'Most active members'
+            headings = ('Rank', 'Member ID', 'Name', 'Borrows' if active else 'Books Out')
+            ranking = self.library.most_active_members(limit) if active else self.library.members_with_most_loans(limit)
+            rows = [(rank, member_id, self.library.members[member_id].name if member_id in self.library.members else '', count)
+                    for rank, (member_id, count) in enumerate(ranking, 1)]
+        elif report == 'Overdue loans':
+            # Every overdue loan right now, most overdue first
+            headings = ('Member ID', 'Book ID', 'Due Date', 'Fine')
+            rows = [(member_id, book_id, due_date, fine) for _, member_id, book_id, due_date, fine in self.library.overdue_loans()]
+        else:
+            # The chosen month, or the last 30 days
+            if month:
+                start = datetime.strptime(month + "-01", "%Y-%m-%d")
+                end = (start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+            else:
+                end = datetime.now()
+                start = end - timedelta(days=29)
+            headings = ('Date', 'Borrows', 'Returns', 'Total')
+            rows = [(day, borrows, returns, borrows + returns) for day, borrows, returns in
+                    self.library.daily_volume(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))]
+        for col, heading in zip(('c1', 'c2', 'c3', 'c4'), headings):
+            self.report_tree.heading(col, text=heading)
+        self.report_tree.delete(*self.report_tree.get_children())
+        for i, row in enumerate(rows):
+            self.report_tree.insert('', tk.END, iid=str(i), values=row)
+
+    # Diagnostics tab: operation counts and latencies from METRICS
+    def create_diagnostics_tab(self):
+        frame = self.tab_diagnostics
+
+        controls = ttk.Frame(frame)
+        controls.pack(fill='x', padx=10, pady=10)
+        self.metrics_var = tk.BooleanVar(value=METRICS.enabled)
+        ttk.Checkbutton(controls, text="Collect timings", variable=self.metrics_var,
+                        command=self.toggle_metrics).pack(side='left')
+        ttk.Button(controls, text="Refresh", command=self.refresh_diagnostics).pack(side='left', padx=5)
+        ttk.Button(controls, text="Reset", command=self.reset_diagnostics).pack(side='left')
+
+        columns = ('Operation', 'Count', 'p50', 'p99', 'Max', 'Total')
+        self.diagnostics_tree = ttk.Treeview(frame, columns=columns, show='headings')
+        for col in columns:
+            self.diagnostics_tree.heading(col, text=col)
+            self.diagnostics_tree.column(col, anchor='center')
+        self.diagnostics_tree.pack(fill='both', expand=True, padx=10)
+        ttk.Label(frame, text="Times in ms; *.bytes rows in bytes.", anchor='w').pack(fill='x', padx=10, pady=5)
+
+    def toggle_metrics(self):
+        METRICS.enabled = self.metrics_var.get()
+        self.refresh_diagnostics()
+
+    def reset_diagnostics(self):
+        METRICS.reset()
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self):
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+        for row in METRICS.rows():
+            self.diagnostics_tree.insert('', tk.END, iid=row[0], values=METRICS.format_row(row))
+
+    # Apply a single model change to the affected row only
+    def on_library_change(self, table, action, key):
+        # While a search is active, re-run it so the filtered list stays correct
+        if table == 'books' and self.book_results is not None:
+            self.search_books()
+            return
+        if table == 'members' and self.member_results is not None:
+            self.search_members()
+            return
+        if table == 'transactions' and not self.transactions_shown:
+            return
+        if action == 'reloaded':
+            {'books': self.refresh_books_list, 'members': self.refresh_members_list,
+             'transactions': self.refresh_transactions_list}[table]()
+            return
+        if self.virtual_lists and table in ('books', 'transactions'):
+            view = self.books_view if table == 'books' else self.trans_view
+            if action == 'inserted':
+                view.row_inserted(len(self.library.books) - 1 if table == 'books' else key)
+            else:
+                view.row_updated(key, self.book_row(self.library.books[key]))
+            return
+        if table == 'books':
+            tree, values = self.books_tree, self.book_row(self.library.books[key])
+        elif table == 'members':
+            member = self.library.members[key]
+            tree, values = self.members_tree, (member.member_id, member.name)
+        else:
+            tree, values = self.trans_tree, self.transaction_row(self.library.transactions[key])
+            key = str(key)
+        if action == 'inserted':
+            tree.insert('', tk.END, iid=key, values=values)
+        else:
+            tree.item(key, values=values)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Library Management System")
+    parser.add_argument('--storage', choices=('json', 'sqlite'), default='json', help="storage backend to use")
+    parser.add_argument('--db', default='library.db', help="database file for the sqlite backend")
+    parser.add_argument('--full-lists', action='store_true', help="build every Treeview row instead of only the visible ones")
+    parser.add_argument('--binary-history', action='store_true', help="snapshot the transaction history in the binary columnar format")
+    parser.add_argument('--import', dest='import_kind', choices=('books', 'members', 'transactions'),
+                        help="import a .csv or .jsonl file without starting the GUI")
+    parser.add_argument('import_path', nargs='?', help="file to import with --import")
+    parser.add_argument('--archive-before', metavar='DATE',
+                        help="move transactions before DATE (YYYY-MM-DD) into the monthly archive and exit")
+    parser.add_argument('--export', metavar='PATH', help="export the whole transaction history to a .csv or .jsonl file and exit")
+    parser.add_argument('--export-from', metavar='DATE', help="first day to export")
+    parser.add_argument('--export-to', metavar='DATE', help="last day to export")
+    parser.add_argument('--profile', action='store_true',
+                        help="collect timings and run under cProfile and tracemalloc; reports are printed on exit")
+    args = parser.parse_args()
+    if args.profile:
+        METRICS.enabled = True
+
+    if args.storage == 'sqlite':
+        storage = SQLiteStorage(args.db)
+    else:
+        storage = JSONStorage(background=True, history_format='binary' if args.binary_history else 'json')
+
+    if args.import_kind:
+        if not args.import_path:
+            parser.error("--import needs a file to import")
+        library = LibrarySystem(storage=storage)
+        try:
+            errors = library.import_file(args.import_path, args.import_kind)
+            library.save_data()
+        finally:
+            library.close()
+        for row_number, error in errors:
+            print(f"Row {row_number}: {error}")
+        print(f"Imported {args.import_path} with {len(errors)} rejected row(s).")
+        if args.profile:
+            print(METRICS.report())
+        raise SystemExit(1 if errors else 0)
+
+    if args.archive_before or args.export:
+        library = LibrarySystem(storage=storage)
+        try:
+            if args.archive_before:
+                moved = library.archive_before(args.archive_before)
+                print(f"Archived {moved} transaction(s) dated before {args.archive_before}.")
+            if args.export:
+                count = library.export_transactions(args.export, args.export_from, args.export_to)
+                print(f"Exported {count} transaction(s) to {args.export}.")
+        except ValueError as e:
+            parser.exit(1, f"{e}\n")
+        finally:
+            library.close()
+        if args.profile:
+            print(METRICS.report())
+        raise SystemExit(0)
+
+    if args.profile:
+        tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
     root = tk.Tk()
-    app = LibraryApp(root)
+    app = LibraryApp(root, LibrarySystem(storage=storage), virtual_lists=not args.full_lists)
     root.mainloop()
+    if args.profile:
+        profiler.disable()
+        profiler.dump_stats('library.prof')
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"Memory: {current / 1e6:.1f} MB in use, {peak / 1e6:.1f} MB peak")
+        for stat in tracemalloc.take_snapshot().statistics('lineno')[:10]:
+            print(stat)
+        print(METRICS.report())
+        print("Full profile saved to library.prof")
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The benchmarks run from this folder; the loader lives in common/ at the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.loader import load_bank, load_library, load_module
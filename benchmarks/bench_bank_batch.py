@@ -0,0 +1,61 @@
+# End-of-day posting: one Bank call per record vs. BatchProcessor
+import argparse
+import os
+import random
+import tempfile
+import time
+from decimal import Decimal
+
+from _loader import load_bank
+
+bank_account = load_bank()
+
+def make_records(numbers, count, seed=0):
+    rng = random.Random(seed)
+    return [(rng.choice(('deposit', 'withdraw')), rng.choice(numbers), rng.randint(1, 1000)) for _ in range(count)]
+
+def open_bank(directory, name, count):
+    # Returns the bank and its account numbers
+    bank = bank_account.Bank(os.path.join(directory, f'{name}.jsonl'), os.path.join(directory, f'{name}.json'),
+                             snapshot_every=10 ** 9)
+    numbers = [bank.open_account(f"owner{i}", 'Savings' if i % 2 else 'Checking').number for i in range(count)]
+    return bank, numbers
+
+def post_one_by_one(bank, records):
+    rejected = []
+    for row, (op, number, amount) in enumerate(records, 1):
+        try:
+            getattr(bank, op)(number, amount)
+        except ValueError as e:
+            rejected.append((row, str(e)))
+    return rejected
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bank batch posting benchmark")
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--records', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{args.accounts} accounts, {args.records} records")
+    with tempfile.TemporaryDirectory() as directory:
+        single, numbers = open_bank(directory, 'single', args.accounts)
+        records = make_records(numbers, args.records)
+        start = time.perf_counter()
+        expected = post_one_by_one(single, records)
+        elapsed = time.perf_counter() - start
+        print(f"one by one {args.records / elapsed:12.0f} records/s")
+
+        batch, _ = open_bank(directory, 'batch', args.accounts)
+        processor = bank_account.BatchProcessor(batch)
+        start = time.perf_counter()
+        rejected = processor.post(records)
+        elapsed = time.perf_counter() - start
+        print(f"batch      {args.records / elapsed:12.0f} records/s   {len(rejected)} rejected")
+        assert rejected == expected
+        assert all(single.accounts[n].balance == batch.accounts[n].balance for n in numbers)
+
+        start = time.perf_counter()
+        credited = processor.accrue_interest(Decimal('0.01'))
+        print(f"interest   {(time.perf_counter() - start) * 1000:8.1f} ms for {credited} accounts")
+        single.close()
+        batch.close()
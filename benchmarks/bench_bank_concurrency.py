@@ -0,0 +1,67 @@
+# Throughput of concurrent deposits, withdrawals and transfers through TransactionEngine
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from _loader import load_bank
+
+bank_account = load_bank()
+
+def make_operations(numbers, count, seed=0):
+    rng = random.Random(seed)
+    operations = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.4:
+            operations.append(('deposit', rng.choice(numbers), rng.randint(1, 500)))
+        elif kind < 0.7:
+            operations.append(('withdraw', rng.choice(numbers), rng.randint(1, 500)))
+        else:
+            source, target = rng.sample(numbers, 2)
+            operations.append(('transfer', source, target, rng.randint(1, 500)))
+    return operations
+
+def measure(directory, workers, accounts, operations):
+    if directory is None:
+        bank = bank_account.Bank(None)
+    else:
+        bank = bank_account.Bank(os.path.join(directory, f'ledger_{workers}.jsonl'),
+                                 os.path.join(directory, f'snapshot_{workers}.json'))
+    # A new bank numbers its accounts from FIRST_ACCOUNT_NUMBER, as make_operations expects
+    for i in range(accounts):
+        account = bank.open_account(f"owner{i}", 'Savings' if i % 2 else 'Checking')
+        bank.deposit(account.number, 10000)
+    total = sum(account.balance for account in bank.accounts.values())
+    engine = bank_account.TransactionEngine(bank, workers)
+    start = time.perf_counter()
+    results = engine.run(operations)
+    elapsed = time.perf_counter() - start
+    engine.shutdown()
+    # Transfers move money around; only deposits and withdrawals change the total
+    expected = total
+    for (op, *args), (ok, _) in zip(operations, results):
+        if ok and op != 'transfer':
+            expected += args[1] if op == 'deposit' else -args[1]
+    actual = sum(account.balance for account in bank.accounts.values())
+    assert actual == expected, (actual, expected)
+    bank.close()
+    rejected = sum(1 for ok, _ in results if not ok)
+    return elapsed, rejected
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bank concurrency benchmark")
+    parser.add_argument('--accounts', type=int, default=100)
+    parser.add_argument('--operations', type=int, default=20000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--memory', action='store_true', help="keep the bank in memory (no ledger)")
+    args = parser.parse_args()
+
+    operations = make_operations(range(bank_account.FIRST_ACCOUNT_NUMBER, bank_account.FIRST_ACCOUNT_NUMBER + args.accounts),
+                                 args.operations)
+    print(f"{args.accounts} accounts, {args.operations} operations, {'in memory' if args.memory else 'ledger on disk'}")
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in args.workers:
+            elapsed, rejected = measure(None if args.memory else directory, workers, args.accounts, operations)
+            print(f"{workers:3} workers {args.operations / elapsed:10.0f} ops/s   {rejected} rejected")
@@ -0,0 +1,97 @@
+# Statement and owner-lookup latency: bisect over the per-account history and
+# the owner index vs. scanning the ledger and every account
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from _loader import load_bank
+
+bank_account = load_bank()
+
+def write_ledger(path, accounts, postings, days, seed=0):
+    # Accounts opened first, then postings spread evenly over `days` days
+    # ending now; returns the account numbers
+    rng = random.Random(seed)
+    numbers = [bank_account.FIRST_ACCOUNT_NUMBER + i for i in range(accounts)]
+    end = int(time.time())
+    start = end - days * 86400
+    seq = 0
+    with open(path, 'w') as f:
+        for i, number in enumerate(numbers):
+            seq += 1
+            f.write(json.dumps({'op': 'open', 'account': number, 'owner': f"Owner {i:07d}",
+                                'type': 'Savings' if i % 2 else 'Checking', 'ts': start, 'seq': seq}) + '\n')
+        for i in range(postings):
+            seq += 1
+            f.write(json.dumps({'op': 'deposit' if i % 3 else 'withdraw', 'account': rng.choice(numbers),
+                                'paisa': rng.randint(1, 1000), 'ts': start + i * (end - start) // postings,
+                                'seq': seq}) + '\n')
+    return numbers
+
+def scan_statement(path, number, start, end):
+    # What a statement costs without histories: read the whole ledger
+    entries = []
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get('account') == number and record['op'] != 'open' and start <= record['ts'] < end:
+                entries.append(record)
+    return entries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bank statement and lookup benchmark")
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--postings', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--statements', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as directory:
+        ledger_file = os.path.join(directory, 'ledger.jsonl')
+        numbers = write_ledger(ledger_file, args.accounts, args.postings, args.days)
+        print(f"{args.accounts} accounts, {args.postings} postings over {args.days} days")
+        start = time.perf_counter()
+        bank = bank_account.Bank(ledger_file, os.path.join(directory, 'snapshot.json'), 10 ** 9)
+        print(f"recover        {(time.perf_counter() - start) * 1000:10.1f} ms")
+        start = time.perf_counter()
+        bank.load_histories()
+        print(f"load histories {(time.perf_counter() - start) * 1000:10.1f} ms (once, on the first statement)")
+
+        today = date.today()
+        ranges = []
+        for _ in range(args.statements):
+            first = today - timedelta(days=rng.randrange(args.days))
+            ranges.append((rng.choice(numbers), first, first + timedelta(days=rng.choice((0, 6, 30)))))
+        samples, entries = [], 0
+        for number, first, last in ranges:
+            began = time.perf_counter()
+            opening, closing, rows = bank.statement(number, first, last)
+            samples.append(time.perf_counter() - began)
+            entries += len(rows)
+        samples.sort()
+        print(f"statement      p50 {samples[len(samples) // 2] * 1e6:8.1f} us   p99 {samples[int(len(samples) * 0.99)] * 1e6:8.1f} us"
+              f"   {entries / len(samples):.1f} entries each")
+
+        number, first, last = ranges[0]
+        began = time.perf_counter()
+        scanned = scan_statement(ledger_file, number, bank_account.day_start(first),
+                                 bank_account.day_start(last + timedelta(days=1)))
+        print(f"ledger scan    {(time.perf_counter() - began) * 1000:10.1f} ms per statement")
+        assert [r['paisa'] for r in scanned] == [abs(row[2]) for row in bank.statement(number, first, last)[2]]
+
+        prefixes = [f"owner {rng.randrange(args.accounts):07d}"[:rng.randint(7, 13)] for _ in range(args.statements)]
+        began = time.perf_counter()
+        for prefix in prefixes:
+            bank.owners.search(prefix, 20)
+        indexed = (time.perf_counter() - began) / len(prefixes)
+        began = time.perf_counter()
+        for prefix in prefixes[:100]:
+            [a.number for a in bank.accounts.values() if a.owner.casefold().startswith(prefix)][:20]
+        scanned = (time.perf_counter() - began) / min(100, len(prefixes))
+        print(f"owner search   {indexed * 1e6:8.1f} us indexed   {scanned * 1e6:8.1f} us scanning every account")
+        bank.close()
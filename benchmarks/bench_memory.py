@@ -0,0 +1,71 @@
+# Bytes per transaction: dict-backed objects vs the columnar TransactionStore
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime, timedelta
+
+from _loader import load_library
+
+library = load_library()
+
+# The record classes without __slots__, holding the same fields as the
+# slotted ones, so only the layout differs
+class DictTransaction:
+    def __init__(self, transaction_id, member_id, book_id, date):
+        self.transaction_id = transaction_id
+        self.member_id = member_id
+        self.book_id = book_id
+        self.date = date
+
+class DictBorrow(DictTransaction):
+    def __init__(self, transaction_id, member_id, book_id, date, due_date):
+        super().__init__(transaction_id, member_id, book_id, date)
+        self.due_date = due_date
+
+class DictReturn(DictTransaction):
+    def __init__(self, transaction_id, member_id, book_id, date, fine):
+        super().__init__(transaction_id, member_id, book_id, date)
+        self.fine = fine
+
+def generate(count, members=1000, books=5000):
+    # (type, transaction_id, member_id, book_id, date, due_date, fine), as
+    # make_transaction and TransactionStore.append take them
+    start = datetime(2020, 1, 1)
+    for i in range(count):
+        date = (start + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S")
+        if i % 2 == 0:
+            yield ('borrow', f"T{i}", f"M{i % members}", f"B{i % books}", date, library.due_after(date), 0)
+        else:
+            yield ('return', f"T{i}", f"M{i % members}", f"B{i % books}", date, None, i % 3 * library.FINE_PER_DAY)
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    data = build(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return current / count
+
+def build_objects(count):
+    return [DictBorrow(*row[1:6]) if row[0] == 'borrow' else DictReturn(*row[1:5], row[6]) for row in generate(count)]
+
+def build_slotted(count):
+    return [library.make_transaction(*row) for row in generate(count)]
+
+def build_store(count):
+    store = library.TransactionStore()
+    for row in generate(count):
+        store.append(*row)
+    return store
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory used per transaction record")
+    parser.add_argument('--count', type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{args.count} transactions")
+    for label, build in (("dict-backed objects", build_objects),
+                         ("__slots__ objects", build_slotted),
+                         ("columnar TransactionStore", build_store)):
+        print(f"{label:28} {measure(build, args.count):8.1f} bytes/transaction")
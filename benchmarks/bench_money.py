@@ -0,0 +1,48 @@
+# Posting throughput and drift with float rupees, Decimal rupees and integer paisa
+import argparse
+import time
+from decimal import Decimal
+
+CHUNK = 1000000
+
+def paisa_amounts(start, count):
+    # Deterministic mix of deposits (positive) and withdrawals (negative)
+    return [((i * 7919) % 100000 + 1) * (1 if i % 3 else -1) for i in range(start, start + count)]
+
+REPRESENTATIONS = {
+    'float': lambda amounts: [a / 100 for a in amounts],
+    'Decimal': lambda amounts: [Decimal(a).scaleb(-2) for a in amounts],
+    'int paisa': lambda amounts: amounts,
+}
+
+def post(balance, amounts, limit):
+    # The same check-and-apply the accounts do for every posting
+    for amount in amounts:
+        if amount < 0 and -amount > balance + limit:
+            continue
+        balance += amount
+    return balance
+
+def measure(name, count):
+    convert = REPRESENTATIONS[name]
+    balance = convert([0])[0]
+    limit = convert([500_00])[0]
+    elapsed = 0.0
+    for start in range(0, count, CHUNK):
+        amounts = convert(paisa_amounts(start, min(CHUNK, count - start)))
+        began = time.perf_counter()
+        balance = post(balance, amounts, limit)
+        elapsed += time.perf_counter() - began
+    return elapsed, balance
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Money representation benchmark")
+    parser.add_argument('--postings', type=int, default=10000000)
+    args = parser.parse_args()
+
+    print(f"{args.postings} postings")
+    for name in REPRESENTATIONS:
+        elapsed, balance = measure(name, args.postings)
+        print(f"{name:10} {args.postings / elapsed:12.0f} postings/s   final balance {balance}")
+    # Integer paisa is exact, so it is the reference for the others
+    print(f"exact final balance {Decimal(balance).scaleb(-2)}")
@@ -0,0 +1,51 @@
+# Startup time: window-ready (books and members) vs. full history loaded
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from _loader import load_library
+import datagen
+
+library = load_library()
+
+def open_library(directory, history_format):
+    storage = library.JSONStorage(*(os.path.join(directory, name) for name in
+                                    ('books.json', 'members.json', 'transactions.json', 'library.journal')),
+                                  history_format=history_format)
+    return library.LibrarySystem(storage=storage)
+
+def measure(directory, history_format, trace_memory):
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    system = open_library(directory, history_format)
+    ready = time.perf_counter() - start
+    # What the first borrow/return or opening the Transactions tab pays
+    len(system.transactions)
+    system.loans
+    loaded = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+    system.close()
+    return ready, loaded, peak
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Library startup benchmark")
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--members', type=int, default=2000)
+    parser.add_argument('--transactions', type=int, default=200000)
+    parser.add_argument('--memory', action='store_true', help="also report peak memory (slower)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        datagen.write_library(directory, args.books, args.members, args.transactions, library)
+        print(f"{args.books} books, {args.members} members, {args.transactions} transactions")
+        for history_format in ('json', 'binary'):
+            ready, loaded, peak = measure(directory, history_format, args.memory)
+            line = f"{history_format:7} window ready {ready * 1000:8.1f} ms   history loaded {loaded * 1000:8.1f} ms"
+            if peak is not None:
+                line += f"   peak {peak / 1e6:7.1f} MB"
+            print(line)
@@ -0,0 +1,149 @@
+# Reproducible benchmark suite for the library and bank hot paths, at
+# 1k/100k/1M scale; results go to JSON and can be compared with a previous run
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import datagen
+import tkstub
+
+SCALES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+# Timed circulation and ledger operations per scale; enough for a stable p99
+LATENCY_SAMPLES = 2000
+LEDGER_SAMPLES = 2000
+
+library = tkstub.load_library_stubbed()
+bank_account = tkstub.load_bank_stubbed()
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {'p50': samples[len(samples) // 2], 'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+            'mean': statistics.fmean(samples)}
+
+def open_library(directory):
+    # The same configuration the GUI runs with
+    storage = library.JSONStorage(*(os.path.join(directory, name) for name in
+                                    ('books.json', 'members.json', 'transactions.json', 'library.journal')),
+                                  background=True)
+    return library.LibrarySystem(storage=storage)
+
+def bench_library(directory, n, results):
+    members = max(100, n // 5)
+    datagen.write_library(directory, n, members, n)
+
+    def load():
+        system = open_library(directory)
+        len(system.transactions)
+        system.loans
+        return system
+    results['library_load_s'], system = timed(load)
+
+    borrow, give_back = [], []
+    for i in range(LATENCY_SAMPLES):
+        member_id, book_id = f"M{i % members}", f"B{(i * 7919) % n}"
+        if system.books[book_id].available_copies == 0:
+            continue
+        elapsed, _ = timed(system.borrow_book, f"BENCH-B{i}", member_id, book_id)
+        borrow.append(elapsed * 1e6)
+        elapsed, _ = timed(system.return_book, f"BENCH-R{i}", member_id, book_id)
+        give_back.append(elapsed * 1e6)
+    for name, samples in (('borrow', borrow), ('return', give_back)):
+        for stat, value in percentiles(samples).items():
+            results[f'{name}_{stat}_us'] = value
+    system.flush()
+
+    def save():
+        system.save_data()
+        system.flush()
+    results['library_save_s'], _ = timed(save)
+
+    # Treeview refresh against the stubbed Tk: the Python side of building rows
+    for virtual in (True, False):
+        label = 'virtual' if virtual else 'full'
+        elapsed, app = timed(library.LibraryApp, tkstub.Tk(), system, virtual)
+        results[f'app_start_{label}_ms'] = elapsed * 1000
+        results[f'refresh_books_{label}_ms'] = timed(app.refresh_books_list)[0] * 1000
+        results[f'refresh_members_{label}_ms'] = timed(app.refresh_members_list)[0] * 1000
+        results[f'refresh_transactions_{label}_ms'] = timed(app.refresh_transactions_list)[0] * 1000
+        del app
+        gc.collect()
+    system.close()
+
+def bench_bank(directory, n, results):
+    ledger_file, snapshot_file = datagen.write_bank(directory, n)
+    results['bank_recover_s'], bank = timed(bank_account.Bank, ledger_file, snapshot_file, 10 ** 9)
+    accounts = list(bank.accounts.values())
+
+    # Account.deposit/withdraw with the ledger: every call waits for its fsync
+    start = time.perf_counter()
+    for i in range(LEDGER_SAMPLES):
+        account = accounts[(i * 7919) % n]
+        account.deposit(100)
+        account.withdraw(100)
+    results['ledger_ops_per_s'] = 2 * LEDGER_SAMPLES / (time.perf_counter() - start)
+    bank.close()
+
+    # The same calls in memory, on accounts without a ledger
+    for account in accounts:
+        account.ledger = None
+    operations = max(2 * LEDGER_SAMPLES, min(n, 1000000))
+    start = time.perf_counter()
+    for i in range(operations // 2):
+        account = accounts[(i * 7919) % n]
+        account.deposit(100)
+        account.withdraw(100)
+    results['memory_ops_per_s'] = operations / (time.perf_counter() - start)
+
+def compare(baseline, current):
+    # Throughput metrics (…_per_s) are better higher, everything else lower
+    for scale, metrics in current['scales'].items():
+        old_metrics = baseline.get('scales', {}).get(scale)
+        if not old_metrics:
+            continue
+        print(f"\n{scale} vs baseline")
+        for name, value in metrics.items():
+            old = old_metrics.get(name)
+            if not old:
+                continue
+            change = (value - old) / old * 100
+            worse = change < 0 if name.endswith('per_s') else change > 0
+            flag = "  REGRESSION" if worse and abs(change) > 10 else ""
+            print(f"  {name:32} {old:14.3f} -> {value:14.3f}  {change:+7.1f}%{flag}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Library and bank benchmark suite")
+    parser.add_argument('--scales', nargs='+', choices=tuple(SCALES), default=['1k', '100k'])
+    parser.add_argument('--output', default='bench_results.json', help="JSON file to write the results to")
+    parser.add_argument('--compare', metavar='BASELINE', help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    report = {'started': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+              'platform': platform.platform(), 'scales': {}}
+    for scale in args.scales:
+        n = SCALES[scale]
+        results = report['scales'][scale] = {}
+        with tempfile.TemporaryDirectory() as directory:
+            bench_library(os.path.join(directory, 'library'), n, results)
+            bench_bank(os.path.join(directory, 'bank'), n, results)
+        print(f"{scale}")
+        for name, value in results.items():
+            print(f"  {name:32} {value:14.3f}")
+        gc.collect()
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
@@ -0,0 +1,69 @@
+# Synthetic data for the benchmarks; seeded so runs are reproducible
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+WORDS = ("history", "river", "garden", "night", "empire", "stone", "silent", "winter", "ocean", "letters",
+         "journey", "fire", "glass", "shadow", "city", "machine", "island", "north", "memory", "song")
+NAMES = ("Ali", "Sara", "Usman", "Ayesha", "Bilal", "Fatima", "Hamza", "Zainab", "Omar", "Hina")
+SURNAMES = ("Khan", "Ahmed", "Malik", "Hussain", "Qureshi", "Sheikh", "Butt", "Raza", "Iqbal", "Chaudhry")
+
+def books(count, seed=1):
+    rng = random.Random(seed)
+    for i in range(count):
+        title = " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 4)))
+        author = f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}"
+        yield {'item_id': f"B{i}", 'title': title, 'author': author, 'total_copies': rng.randint(1, 5)}
+
+def members(count, seed=2):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {'member_id': f"M{i}", 'name': f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}"}
+
+def transactions(count, book_count, member_count, seed=3, start=datetime(2020, 1, 1)):
+    # Alternating borrow/return pairs, so every return matches an open loan
+    rng = random.Random(seed)
+    for i in range(0, count - 1, 2):
+        member_id = f"M{rng.randrange(member_count)}"
+        book_id = f"B{rng.randrange(book_count)}"
+        borrowed = start + timedelta(minutes=i)
+        returned = borrowed + timedelta(days=rng.randint(1, 30))
+        yield {'transaction_id': f"T{i}", 'member_id': member_id, 'book_id': book_id,
+               'date': borrowed.strftime("%Y-%m-%d %H:%M:%S"), 'type': 'borrow'}
+        yield {'transaction_id': f"T{i + 1}", 'member_id': member_id, 'book_id': book_id,
+               'date': returned.strftime("%Y-%m-%d %H:%M:%S"), 'type': 'return'}
+
+def write_library(directory, book_count, member_count, transaction_count, library=None):
+    # Writes JSON snapshots in the format JSONStorage reads; with the library
+    # module given, also writes the binary history snapshot
+    os.makedirs(directory, exist_ok=True)
+    book_records = [dict(b, available_copies=b['total_copies']) for b in books(book_count)]
+    history = list(transactions(transaction_count, book_count, member_count))
+    for name, records in (('books.json', book_records),
+                          ('members.json', list(members(member_count))),
+                          ('transactions.json', history)):
+        with open(os.path.join(directory, name), 'w') as f:
+            json.dump({'seq': 0, 'records': records}, f)
+    if library is not None:
+        store = library.TransactionStore()
+        for t in history:
+            store.append(t['type'], t['transaction_id'], t['member_id'], t['book_id'], t['date'])
+        store.write_binary(os.path.join(directory, 'transactions.bin'), 0)
+    return directory
+
+def accounts(count, seed=4, first_number=100001):
+    # Balances in paisa, half Savings and half Checking
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {'number': first_number + i, 'owner': f"{rng.choice(NAMES)} {rng.choice(SURNAMES)} {i}",
+               'type': 'Savings' if i % 2 else 'Checking', 'balance_paisa': rng.randint(0, 10000000)}
+
+def write_bank(directory, account_count):
+    # Writes a balance snapshot in the format Bank recovers from, with an empty ledger
+    os.makedirs(directory, exist_ok=True)
+    snapshot_file = os.path.join(directory, 'bank_snapshot.json')
+    with open(snapshot_file, 'w') as f:
+        json.dump({'seq': 0, 'ledger_offset': 0, 'next_number': 100001 + account_count,
+                   'accounts': list(accounts(account_count))}, f)
+    return os.path.join(directory, 'bank_ledger.jsonl'), snapshot_file
@@ -0,0 +1,118 @@
+# Stand-ins for tkinter, ttk and messagebox so the GUI code can be timed
+# without a display. Treeview keeps its rows the way the real one does;
+# every other widget accepts and ignores its calls.
+import os
+import sys
+import types
+
+from _loader import load_module
+
+class Widget:
+    def __init__(self, master=None, *args, **options):
+        self.master = master
+
+    def __getattr__(self, name):
+        # pack, grid, bind, config, heading, column, title, protocol, ...
+        return lambda *args, **kwargs: None
+
+class Tk(Widget):
+    def after(self, delay, callback=None, *args):
+        return 'after#0'
+
+class Entry(Widget):
+    def get(self):
+        return ''
+
+class Combobox(Entry):
+    def __init__(self, master=None, *args, textvariable=None, **options):
+        super().__init__(master)
+        self.textvariable = textvariable
+
+    def get(self):
+        return self.textvariable.get() if self.textvariable is not None else ''
+
+class Notebook(Widget):
+    def select(self, tab_id=None):
+        return ''
+
+class Style(Widget):
+    def lookup(self, style, option, *args, **kwargs):
+        return ''
+
+class Treeview(Widget):
+    def __init__(self, master=None, *args, **options):
+        super().__init__(master)
+        self.rows = {}
+
+    def insert(self, parent, index, iid=None, values=(), **options):
+        if iid is None:
+            iid = f"I{len(self.rows) + 1:03X}"
+        if iid in self.rows:
+            raise ValueError(f"Item {iid} already exists")
+        self.rows[iid] = tuple(values)
+        return iid
+
+    def delete(self, *items):
+        for iid in items:
+            del self.rows[iid]
+
+    def get_children(self, item=''):
+        return tuple(self.rows)
+
+    def exists(self, iid):
+        return iid in self.rows
+
+    def item(self, iid, **options):
+        if 'values' in options:
+            self.rows[iid] = tuple(options['values'])
+        return {'values': list(self.rows[iid])}
+
+class Variable:
+    def __init__(self, master=None, value=''):
+        self.value = value
+        self.callbacks = []
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+        for callback in self.callbacks:
+            callback('', '', 'write')
+
+    def trace_add(self, mode, callback):
+        self.callbacks.append(callback)
+
+def stub_modules():
+    tk = types.ModuleType('tkinter')
+    ttk = types.ModuleType('tkinter.ttk')
+    messagebox = types.ModuleType('tkinter.messagebox')
+    tk.END = 'end'
+    tk.Tk, tk.Entry = Tk, Entry
+    tk.StringVar = tk.BooleanVar = tk.IntVar = Variable
+    tk.Label = tk.LabelFrame = tk.Button = tk.Radiobutton = tk.Frame = tk.Toplevel = tk.Text = Widget
+    ttk.Treeview, ttk.Entry, ttk.Combobox, ttk.Notebook, ttk.Style = Treeview, Entry, Combobox, Notebook, Style
+    ttk.Frame = ttk.Label = ttk.LabelFrame = ttk.Button = ttk.Checkbutton = ttk.Scrollbar = Widget
+    messagebox.showinfo = messagebox.showerror = messagebox.showwarning = lambda *args, **kwargs: 'ok'
+    tk.ttk, tk.messagebox = ttk, messagebox
+    return {'tkinter': tk, 'tkinter.ttk': ttk, 'tkinter.messagebox': messagebox}
+
+def load_stubbed(relative_path, name):
+    # Imports a GUI script against the stubs, leaving the real tkinter alone
+    modules = stub_modules()
+    saved = {key: sys.modules.get(key) for key in modules}
+    sys.modules.update(modules)
+    try:
+        return load_module(relative_path, name)
+    finally:
+        for key, module in saved.items():
+            if module is None:
+                sys.modules.pop(key, None)
+            else:
+                sys.modules[key] = module
+
+def load_library_stubbed():
+    return load_stubbed(os.path.join('Liabrary_Management_System', 'library system.py'), 'library_system_stubbed')
+
+def load_bank_stubbed():
+    return load_stubbed(os.path.join('Bank Account Management', 'Bank Account.py'), 'bank_account_stubbed')
@@ -0,0 +1,22 @@
+# Imports the project scripts for the service, the benchmarks and the tests
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The project scripts have spaces in their file names, so import them by path
+def load_module(relative_path, name):
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def load_library():
+    return load_module(os.path.join('Liabrary_Management_System', 'library system.py'), 'library_system')
+
+def load_bank():
+    return load_module(os.path.join('Bank Account Management', 'Bank Account.py'), 'bank_account')
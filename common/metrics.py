@@ -0,0 +1,101 @@
+# Opt-in timing histograms, size histograms and counters, shared by the
+# library and bank apps
+import functools
+import math
+import threading
+import time
+
+# Log-scale histogram, four buckets per doubling, so percentiles are within
+# about 19% whatever the range of values
+class Histogram:
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = {}
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        bucket = math.floor(math.log2(value) * 4) if value > 0 else None
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, fraction):
+        # Upper edge of the bucket holding the value, capped at the maximum
+        rank = fraction * self.count
+        seen = 0
+        for bucket in sorted(self.buckets, key=lambda b: -math.inf if b is None else b):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return 0 if bucket is None else min(self.max, 2 ** ((bucket + 1) / 4))
+        return self.max
+
+# Opt-in timings, sizes and counters for the hot paths; off unless enabled
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.timings = {}
+            self.sizes = {}
+            self.counters = {}
+
+    def record_time(self, name, seconds):
+        with self.lock:
+            self.timings.setdefault(name, Histogram()).add(seconds)
+
+    def record_size(self, name, size):
+        if self.enabled:
+            with self.lock:
+                self.sizes.setdefault(name, Histogram()).add(size)
+
+    def increment(self, name, amount=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def rows(self):
+        # (name, count, p50, p99, max, total) with times in milliseconds
+        with self.lock:
+            rows = [(name, h.count, h.percentile(0.5) * 1000, h.percentile(0.99) * 1000, h.max * 1000, h.total * 1000)
+                    for name, h in sorted(self.timings.items())]
+            rows += [(name, h.count, h.percentile(0.5), h.percentile(0.99), h.max, h.total)
+                     for name, h in sorted(self.sizes.items())]
+            return rows + [(name, value, '', '', '', value) for name, value in sorted(self.counters.items())]
+
+    @staticmethod
+    def format_row(row):
+        # Milliseconds to three places, bytes and counts as whole numbers
+        name, count = row[:2]
+        places = 0 if name.endswith('.bytes') else 3
+        return (name, count) + tuple(v if isinstance(v, str) else f"{v:.{places}f}" for v in row[2:])
+
+    def report(self):
+        lines = [f"{'operation':32} {'count':>8} {'p50':>10} {'p99':>10} {'max':>10} {'total':>14}"]
+        for row in self.rows():
+            name, count, p50, p99, largest, total = self.format_row(row)
+            lines.append(f"{name:32} {count:8} {p50:>10} {p99:>10} {largest:>10} {total:>14}")
+        lines.append("Times in ms; *.bytes rows in bytes.")
+        return '\n'.join(lines)
+
+METRICS = Metrics()
+
+def timed(name):
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                METRICS.record_time(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
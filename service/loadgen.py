@@ -0,0 +1,139 @@
+# Load generator for service.py: reports requests/sec and latency percentiles
+import argparse
+import asyncio
+import json
+import random
+import time
+
+class Client:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def send(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                          f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data)
+        await self.writer.drain()
+
+    async def receive(self):
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length)) if length else None
+
+    async def request(self, method, path, body=None):
+        await self.send(method, path, body)
+        return await self.receive()
+
+    def close(self):
+        self.writer.close()
+
+def bank_request(rng, numbers):
+    kind = rng.random()
+    if kind < 0.45:
+        return 'POST', '/bank/deposit', {'account': rng.choice(numbers), 'paisa': rng.randint(1, 100000)}
+    if kind < 0.8:
+        return 'POST', '/bank/withdraw', {'account': rng.choice(numbers), 'paisa': rng.randint(1, 100000)}
+    if kind < 0.9:
+        source, target = rng.sample(numbers, 2)
+        return 'POST', '/bank/transfer', {'from': source, 'to': target, 'paisa': rng.randint(1, 100000)}
+    return 'GET', f'/bank/accounts/{rng.choice(numbers)}', None
+
+def library_request(rng, run_id, seed, counter, books, members):
+    kind = rng.random()
+    if kind < 0.5:
+        return 'GET', f'/library/books?q=title+{rng.randrange(books)}&limit=10', None
+    counter[0] += 1
+    # Each borrow is followed by the return of the same book, so returns
+    # find an open loan
+    operation = 'borrow' if counter[0] % 2 else 'return'
+    book = (seed * 7919 + (counter[0] - 1) // 2) % books
+    return 'POST', f'/library/{operation}', {'transaction_id': f'{run_id}-C{seed}-T{counter[0]}',
+                                             'member_id': f'{run_id}-M{book % members}', 'book_id': f'{run_id}-B{book}'}
+
+async def setup(client, args, run_id):
+    if args.target == 'bank':
+        numbers = []
+        for i in range(args.accounts):
+            _, account = await client.request('POST', '/bank/accounts', {'owner': f'{run_id}-owner{i}',
+                                                                         'type': 'Savings' if i % 2 else 'Checking'})
+            numbers.append(account['number'])
+            await client.request('POST', '/bank/deposit', {'account': account['number'], 'paisa': 10000000})
+        return numbers
+    for i in range(args.books):
+        await client.request('POST', '/library/books', {'item_id': f'{run_id}-B{i}', 'title': f'Title {i}',
+                                                        'author': f'Author {i % 97}', 'total_copies': 1000})
+    for i in range(args.members):
+        await client.request('POST', '/library/members', {'member_id': f'{run_id}-M{i}', 'name': f'Member {i}'})
+    return None
+
+async def worker(args, run_id, seed, numbers, deadline, latencies, statuses):
+    rng = random.Random(seed)
+    counter = [0]
+    client = Client(args.host, args.port)
+    await client.connect()
+    try:
+        while time.perf_counter() < deadline:
+            requests = []
+            for _ in range(args.pipeline):
+                if args.target == 'bank':
+                    requests.append(bank_request(rng, numbers))
+                else:
+                    requests.append(library_request(rng, run_id, seed, counter, args.books, args.members))
+            # Pipelining: send the whole window, then read the answers in order
+            start = time.perf_counter()
+            for method, path, body in requests:
+                await client.send(method, path, body)
+            for _ in requests:
+                status, _ = await client.receive()
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        client.close()
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+async def main(args):
+    run_id = f'load{int(time.time())}'
+    client = Client(args.host, args.port)
+    await client.connect()
+    numbers = await setup(client, args, run_id)
+    client.close()
+
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(worker(args, run_id, seed, numbers, deadline, latencies, statuses)
+                           for seed in range(args.connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{args.target}: {args.connections} connections, pipeline depth {args.pipeline}, {elapsed:.1f} s")
+    print(f"{len(latencies)} requests   {len(latencies) / elapsed:10.0f} req/s")
+    print(f"latency p50 {percentile(latencies, 0.5) * 1000:7.2f} ms   p99 {percentile(latencies, 0.99) * 1000:7.2f} ms"
+          f"   max {latencies[-1] * 1000:7.2f} ms")
+    print("status codes " + ', '.join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load generator for the headless service")
+    parser.add_argument('target', choices=('bank', 'library'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--pipeline', type=int, default=1, help="requests in flight per connection")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to run")
+    parser.add_argument('--accounts', type=int, default=100)
+    parser.add_argument('--books', type=int, default=1000)
+    parser.add_argument('--members', type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
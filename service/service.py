@@ -0,0 +1,398 @@
+# Headless HTTP/JSON service over the bank and library engines (no Tk needed)
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.loader import load_bank, load_library
+
+bank_account = load_bank()
+library_system = load_library()
+
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+MAX_BODY = 16 * 1024 * 1024
+PIPELINE_DEPTH = 64
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# One asyncio lock per key (account number or book ID); waiters get the lock in arrival
+# order, so operations on the same key run in the order they were received
+class KeyedLocks:
+    def __init__(self):
+        self.locks = {}
+
+    async def acquire(self, keys):
+        # Sorted, so two requests over the same keys can't deadlock
+        keys = sorted(set(keys))
+        for key in keys:
+            entry = self.locks.setdefault(key, [asyncio.Lock(), 0])
+            entry[1] += 1
+            await entry[0].acquire()
+        return keys
+
+    def release(self, keys):
+        for key in keys:
+            entry = self.locks[key]
+            entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.locks[key]
+
+def account_json(account):
+    return {'number': account.number, 'owner': account.owner, 'type': bank_account.account_type(account),
+            'balance_paisa': account.balance, 'balance': bank_account.format_amount(account.balance)}
+
+def book_json(book):
+    return {'item_id': book.item_id, 'title': book.title, 'author': book.author,
+            'total_copies': book.total_copies, 'available_copies': book.available_copies}
+
+def member_json(member):
+    return {'member_id': member.member_id, 'name': member.name}
+
+def transaction_json(t):
+    data = {'transaction_id': t.transaction_id, 'type': 'borrow' if isinstance(t, library_system.BorrowTransaction) else 'return',
+            'member_id': t.member_id, 'book_id': t.book_id, 'date': t.date}
+    if isinstance(t, library_system.BorrowTransaction):
+        data['due_date'] = t.due_date
+    else:
+        data['fine'] = t.fine
+    return data
+
+def field(body, name, kind=str):
+    if not isinstance(body, dict):
+        raise HTTPError(400, "Body must be a JSON object.")
+    value = body.get(name)
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise HTTPError(400, f"Field '{name}' is required and must be {'an integer' if kind is int else 'a string'}.")
+    return value
+
+def batch_request(request):
+    # One /batch entry -> (method, path, body)
+    if not isinstance(request, dict):
+        raise HTTPError(400, "Each batch request must be a JSON object.")
+    method, path, body = request.get('method', 'GET'), request.get('path'), request.get('body')
+    if not isinstance(method, str):
+        raise HTTPError(400, "A batch request's 'method' must be a string.")
+    if not isinstance(path, str):
+        raise HTTPError(400, "Each batch request needs a 'path'.")
+    if body is not None and not isinstance(body, (dict, list)):
+        raise HTTPError(400, "A batch request's 'body' must be a JSON object or list.")
+    return method.upper(), path, body or {}
+
+class Service:
+    def __init__(self, bank, library, bank_workers=16):
+        self.bank = bank
+        self.library = library
+        # Bank calls run in parallel (accounts lock themselves and the ledger
+        # group-commits); LibrarySystem shares its indexes and journal across
+        # books, so library calls run one at a time on their own thread
+        self.bank_pool = ThreadPoolExecutor(max_workers=bank_workers)
+        self.library_pool = ThreadPoolExecutor(max_workers=1)
+        self.account_locks = KeyedLocks()
+        self.book_locks = KeyedLocks()
+        self.routes = [
+            ('GET', ('bank', 'accounts'), self.search_accounts),
+            ('POST', ('bank', 'accounts'), self.open_account),
+            ('GET', ('bank', 'accounts', None), self.get_account),
+            ('GET', ('bank', 'accounts', None, 'statement'), self.statement),
+            ('POST', ('bank', 'deposit'), self.deposit),
+            ('POST', ('bank', 'withdraw'), self.withdraw),
+            ('POST', ('bank', 'transfer'), self.transfer),
+            ('GET', ('library', 'books'), self.search_books),
+            ('POST', ('library', 'books'), self.add_book),
+            ('GET', ('library', 'books', None), self.get_book),
+            ('POST', ('library', 'members'), self.add_member),
+            ('GET', ('library', 'members', None, 'loans'), self.member_loans),
+            ('GET', ('library', 'overdue'), self.overdue_loans),
+            ('POST', ('library', 'borrow'), self.borrow),
+            ('POST', ('library', 'return'), self.return_book),
+            ('POST', ('batch',), self.batch),
+        ]
+
+    async def run_bank(self, keys, function, *args):
+        keys = await self.account_locks.acquire(keys)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.bank_pool, function, *args)
+        finally:
+            self.account_locks.release(keys)
+
+    async def run_library(self, keys, function, *args):
+        keys = await self.book_locks.acquire(keys)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.library_pool, function, *args)
+        finally:
+            self.book_locks.release(keys)
+
+    def account(self, number):
+        account = self.bank.accounts.get(number)
+        if account is None:
+            raise HTTPError(404, "Account not found.")
+        return account_json(account)
+
+    def account_number(self, segment):
+        if not segment.isdecimal():
+            raise HTTPError(404, "Account not found.")
+        return int(segment)
+
+    async def dispatch(self, method, target, body):
+        # Returns (status, payload); errors become {'error': message}
+        parts = urlsplit(target)
+        segments = tuple(unquote(s) for s in parts.path.strip('/').split('/'))
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        try:
+            allowed = False
+            for route_method, pattern, handler in self.routes:
+                if len(pattern) != len(segments) or any(p is not None and p != s for p, s in zip(pattern, segments)):
+                    continue
+                allowed = True
+                if route_method == method:
+                    params = [s for p, s in zip(pattern, segments) if p is None]
+                    return await handler(*params, query=query, body=body)
+            raise HTTPError(405 if allowed else 404, "Method not allowed." if allowed else "No such endpoint.")
+        except HTTPError as e:
+            return e.status, {'error': str(e)}
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': f"{type(e).__name__}: {e}"}
+
+    # Bank
+    async def open_account(self, query, body):
+        owner, acc_type = field(body, 'owner'), field(body, 'type')
+        if acc_type not in bank_account.ACCOUNT_TYPES:
+            raise HTTPError(400, "Account type must be Savings or Checking.")
+        # The bank hands out the number, so there is no key to order on yet
+        account = await self.run_bank([], self.bank.open_account, owner, acc_type)
+        return 201, account_json(account)
+
+    async def search_accounts(self, query, body):
+        try:
+            limit = int(query.get('limit', 50))
+        except ValueError:
+            raise HTTPError(400, "limit must be an integer.")
+        return 200, [account_json(account) for account in self.bank.find_accounts(query.get('owner', ''), limit)]
+
+    async def get_account(self, number, query, body):
+        return 200, self.account(self.account_number(number))
+
+    async def statement(self, number, query, body):
+        number = self.account_number(number)
+        account = self.account(number)
+        start, end = (bank_account.parse_date(query[name]) if query.get(name) else None for name in ('from', 'to'))
+        opening, closing, entries = await self.run_bank([number], self.bank.statement, number, start, end)
+        return 200, {'account': account, 'from': query.get('from'), 'to': query.get('to'),
+                     'opening_paisa': opening, 'closing_paisa': closing,
+                     'entries': [{'date': when.isoformat(), 'kind': kind, 'paisa': amount, 'balance_paisa': balance}
+                                 for when, kind, amount, balance in entries]}
+
+    async def deposit(self, query, body):
+        number, paisa = field(body, 'account', int), field(body, 'paisa', int)
+        self.account(number)
+        await self.run_bank([number], self.bank.deposit, number, paisa)
+        return 200, self.account(number)
+
+    async def withdraw(self, query, body):
+        number, paisa = field(body, 'account', int), field(body, 'paisa', int)
+        self.account(number)
+        await self.run_bank([number], self.bank.withdraw, number, paisa)
+        return 200, self.account(number)
+
+    async def transfer(self, query, body):
+        source, target, paisa = field(body, 'from', int), field(body, 'to', int), field(body, 'paisa', int)
+        self.account(source)
+        self.account(target)
+        await self.run_bank([source, target], self.bank.transfer, source, target, paisa)
+        return 200, {'from': self.account(source), 'to': self.account(target)}
+
+    # Library
+    async def search_books(self, query, body):
+        try:
+            limit = int(query.get('limit', 50))
+        except ValueError:
+            raise HTTPError(400, "limit must be an integer.")
+        books = await self.run_library([], self.library.search_books, query.get('q', ''), limit)
+        return 200, [book_json(book) for book in books]
+
+    async def get_book(self, item_id, query, body):
+        book = self.library.books.get(item_id)
+        if book is None:
+            raise HTTPError(404, "Book not found.")
+        return 200, book_json(book)
+
+    async def add_book(self, query, body):
+        item_id, title, author = field(body, 'item_id'), field(body, 'title'), field(body, 'author')
+        total_copies = field(body, 'total_copies', int)
+        if total_copies <= 0:
+            raise HTTPError(400, "Total copies must be positive.")
+        await self.run_library([item_id], self.library.add_book, item_id, title, author, total_copies)
+        return 201, book_json(self.library.books[item_id])
+
+    async def add_member(self, query, body):
+        member_id, name = field(body, 'member_id'), field(body, 'name')
+        await self.run_library([], self.library.add_member, member_id, name)
+        return 201, member_json(self.library.members[member_id])
+
+    async def member_loans(self, member_id, query, body):
+        if member_id not in self.library.members:
+            raise HTTPError(404, "Member not found.")
+        loans = await self.run_library([], self.library.current_loans, member_id)
+        return 200, [transaction_json(t) for t in loans]
+
+    async def overdue_loans(self, query, body):
+        rows = await self.run_library([], self.library.overdue_loans)
+        return 200, [{'transaction_id': loan_id, 'member_id': member_id, 'book_id': book_id, 'due_date': due_date, 'fine': fine}
+                     for loan_id, member_id, book_id, due_date, fine in rows]
+
+    async def borrow(self, query, body):
+        return await self._circulate(self.library.borrow_book, body)
+
+    async def return_book(self, query, body):
+        return await self._circulate(self.library.return_book, body)
+
+    async def _circulate(self, operation, body):
+        transaction_id, member_id, book_id = field(body, 'transaction_id'), field(body, 'member_id'), field(body, 'book_id')
+        fine = await self.run_library([book_id], operation, transaction_id, member_id, book_id)
+        data = transaction_json(self.library.get_transaction(transaction_id))
+        if fine is not None:
+            data['fine'] = fine
+        return 201, data
+
+    # [{'method', 'path', 'body'}, ...] -> [{'status', 'body'}, ...]; the
+    # requests run concurrently, and still in order per account or book
+    async def batch(self, query, body):
+        if not isinstance(body, list):
+            raise HTTPError(400, "Batch body must be a list of requests.")
+        # Every entry is checked before any runs; a malformed one gets a 400
+        # of its own and the others still run
+        requests = []
+        for request in body:
+            try:
+                requests.append(batch_request(request))
+            except HTTPError as e:
+                requests.append(e)
+        responses = await asyncio.gather(*(self.error_response(request) if isinstance(request, HTTPError)
+                                           else self.dispatch(*request) for request in requests))
+        return 200, [{'status': status, 'body': payload} for status, payload in responses]
+
+    # HTTP/1.1 with keep-alive; pipelined requests are handled concurrently
+    # and answered in the order they arrived
+    async def handle_connection(self, reader, writer):
+        responses = asyncio.Queue(PIPELINE_DEPTH)
+        sender = asyncio.create_task(self.send_responses(responses, writer))
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, target, body, keep_alive = request
+                await responses.put((asyncio.ensure_future(self.handle_request(method, target, body)), keep_alive))
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HTTPError as e:
+            await responses.put((asyncio.ensure_future(self.error_response(e)), False))
+        await responses.put(None)
+        await sender
+
+    async def error_response(self, error):
+        return error.status, {'error': str(error)}
+
+    async def handle_request(self, method, target, body):
+        if isinstance(body, HTTPError):
+            return body.status, {'error': str(body)}
+        return await self.dispatch(method, target, body)
+
+    async def read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(400, "Malformed request line.")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = headers.get('content-length') or '0'
+        if not length.isdecimal():
+            raise HTTPError(400, "Content-Length must be a non-negative integer.")
+        length = int(length)
+        if length > MAX_BODY:
+            raise HTTPError(413, "Request body too large.")
+        raw = await reader.readexactly(length) if length else b''
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            body = HTTPError(400, "Body is not valid JSON.")
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        return method.upper(), target, body, keep_alive
+
+    async def send_responses(self, responses, writer):
+        try:
+            while True:
+                item = await responses.get()
+                if item is None:
+                    break
+                future, keep_alive = item
+                status, payload = await future
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        self.bank_pool.shutdown()
+        self.library_pool.shutdown()
+        self.bank.close()
+        self.library.close()
+
+async def serve(service, host, port):
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"Serving on http://{host}:{server.sockets[0].getsockname()[1]}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless bank and library service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--data-dir', default='.', help="folder for the ledger, snapshots and library files")
+    parser.add_argument('--memory-bank', action='store_true', help="keep bank accounts in memory (no ledger)")
+    parser.add_argument('--workers', type=int, default=16, help="threads for bank operations")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    path = lambda name: os.path.join(args.data_dir, name)
+    if args.memory_bank:
+        bank = bank_account.Bank(None)
+    else:
+        bank = bank_account.Bank(path('bank_ledger.jsonl'), path('bank_snapshot.json'))
+    storage = library_system.JSONStorage(path('books.json'), path('members.json'), path('transactions.json'),
+                                         path('library.journal'), background=True)
+    service = Service(bank, library_system.LibrarySystem(storage=storage), args.workers)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
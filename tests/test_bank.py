@@ -0,0 +1,69 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.loader import load_bank
+
+bank_account = load_bank()
+
+def open_bank(tmp_path):
+    return bank_account.Bank(str(tmp_path / 'ledger.jsonl'), str(tmp_path / 'snapshot.json'))
+
+def test_oversized_deposit_never_reaches_the_ledger(tmp_path):
+    bank = open_bank(tmp_path)
+    number = bank.open_account('Ali Khan', 'Savings').number
+    bank.deposit(number, 500)
+    with pytest.raises(ValueError):
+        bank.deposit(number, 10 ** 19)
+    with pytest.raises(ValueError):
+        bank.deposit(number, bank_account.parse_amount('1e17'))
+    bank.close()
+
+    bank = open_bank(tmp_path)
+    opening, closing, entries = bank.statement(number)
+    assert (opening, closing, len(entries)) == (0, 500, 1)
+    assert bank_account.BatchProcessor(bank).post([('deposit', number, 1)]) == []
+    assert bank_account.BatchProcessor(bank).accrue_interest('0.01') == 1
+    bank.close()
+
+def test_balance_cannot_pass_the_64_bit_limit(tmp_path):
+    bank = open_bank(tmp_path)
+    source = bank.open_account('Ali Khan', 'Checking').number
+    target = bank.open_account('Sara', 'Savings').number
+    bank.deposit(source, 100)
+    bank.deposit(target, bank_account.MAX_PAISA - 50)
+    with pytest.raises(ValueError):
+        bank.deposit(target, 51)
+    with pytest.raises(ValueError):
+        bank.transfer(source, target, 51)
+    processor = bank_account.BatchProcessor(bank)
+    assert processor.post([('deposit', target, 51), ('deposit', source, 10 ** 19)]) == [
+        (1, "The balance would be too large."), (2, "Amount is too large.")]
+    with pytest.raises(ValueError):
+        processor.accrue_interest('0.01')
+    bank.close()
+
+    bank = open_bank(tmp_path)
+    assert bank.accounts[target].balance == bank_account.MAX_PAISA - 50
+    assert bank.statement(target)[1] == bank_account.MAX_PAISA - 50
+    bank.close()
+
+def test_batch_errors_are_value_errors_with_rows_from_1(tmp_path):
+    bank = open_bank(tmp_path)
+    number = bank.open_account('Ali Khan', 'Savings').number
+    bank.deposit(number, 250)
+    processor = bank_account.BatchProcessor(bank)
+    for rate in ('abc', 'NaN', float('inf'), '-0.01'):
+        with pytest.raises(ValueError):
+            processor.accrue_interest(rate)
+    with pytest.raises(ValueError):
+        processor.accrue_interest('0.01', 'Current')
+    with pytest.raises(ValueError):
+        processor.assess_fee(100, 'Current')
+    assert processor.post([('deposit', number, 1), ('deposit', 999, 1)]) == [(2, "Account not found: 999")]
+    # Half a paisa rounds up
+    assert processor.accrue_interest('0.01') == 1 and bank.accounts[number].balance == 254
+    bank.close()
@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.loader import load_library
+
+library_system = load_library()
+
+STORAGES = ('json', 'binary', 'sqlite')
+
+def open_library(tmp_path, kind):
+    if kind == 'sqlite':
+        storage = library_system.SQLiteStorage(str(tmp_path / 'library.db'))
+    else:
+        storage = library_system.JSONStorage(*(str(tmp_path / name) for name in
+                                               ('books.json', 'members.json', 'transactions.json', 'library.journal')),
+                                             history_format=kind)
+    return library_system.LibrarySystem(storage=storage)
+
+def late_loan(library, transaction_id, member_id='M1', book_id='B1'):
+    # A loan that fell due on 2024-01-15
+    assert library.apply_transactions_bulk([{'type': 'borrow', 'transaction_id': transaction_id, 'member_id': member_id,
+                                             'book_id': book_id, 'date': '2024-01-01', 'due_date': '2024-01-15'}]) == []
+
+@pytest.mark.parametrize('kind', STORAGES)
+def test_fine_for_a_late_return_stays_charged(tmp_path, kind):
+    library = open_library(tmp_path, kind)
+    library.add_book('B1', 'Title', 'Author', 3)
+    library.add_member('M1', 'Member')
+    late_loan(library, 'T1')
+    late_loan(library, 'T2')
+    fine = library.return_book('R1', 'M1', 'B1')
+    assert fine > 0
+    assert library.get_transaction('R1').fine == fine
+    library.accrue_fines()
+    accrued = library.fines['M1']
+    assert accrued >= 2 * fine
+    library.save_data()
+    library.close()
+
+    library = open_library(tmp_path, kind)
+    library.accrue_fines()
+    assert library.fines == {'M1': accrued}
+    library.close()
+
+@pytest.mark.parametrize('kind', STORAGES)
+def test_undone_return_takes_back_its_fine(tmp_path, kind):
+    library = open_library(tmp_path, kind)
+    library.add_book('B1', 'Title', 'Author', 3)
+    library.add_member('M1', 'Member')
+    late_loan(library, 'T1')
+    fine = library.return_book('R1', 'M1', 'B1')
+    assert library.loans.charged == {'M1': fine}
+    library.undo()
+    assert library.loans.charged == {}
+    assert [loan_id for loan_id, *_ in library.overdue_loans()] == ['T1']
+    library.close()
+
+def test_bulk_return_and_archive_keep_fines(tmp_path):
+    library = open_library(tmp_path, 'json')
+    library.add_book('B1', 'Title', 'Author', 3)
+    library.add_member('M1', 'Member')
+    late_loan(library, 'T1')
+    assert library.apply_transactions_bulk([{'type': 'return', 'transaction_id': 'R1', 'member_id': 'M1', 'book_id': 'B1',
+                                             'date': '2024-01-20'}]) == []
+    # Five days overdue
+    assert library.get_transaction('R1').fine == 5 * library_system.FINE_PER_DAY
+    assert library.archive_before('2025-01-01') == 2
+    library.close()
+
+    library = open_library(tmp_path, 'json')
+    assert library.get_transaction('R1') is None
+    assert library.accrue_fines() == {'M1': 5 * library_system.FINE_PER_DAY}
+    library.close()